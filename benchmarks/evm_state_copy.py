@@ -0,0 +1,40 @@
+"""
+    EVMState cloning, structural copy against the former dump/load round-trip
+
+    python -m benchmarks.evm_state_copy [--keys 2] [--number 20000]
+"""
+import argparse
+import timeit
+
+from disco.common.structures.evm_type import EVMType
+from disco.common.structures.evm_variable import EVMArg, EVMState
+from disco.common.structures.tac_tree import OpTree
+
+def mapping_state(n_keys:int) -> EVMState:
+    """balances[CALLER][Arg0]-like state, with the key trees of a lifted SLOAD"""
+    keys = []
+    for i in range(n_keys):
+        key = OpTree("AND", [OpTree.from_value(2**160 - 1), OpTree("CALLDATALOAD", OpTree.from_value(4 + 0x20 * i))])
+        key.sons[1].alias_evm_variable = EVMArg(4 + 0x20 * i)
+        keys.append(key)
+    state = EVMState(index=3, offset=None, length=None, type=EVMType(type_name="mapping"), name="balances", keys=keys, counts=2)
+    state.counts_mapping[str(keys)].extend([0x1f4, 0x2a8])
+    return state
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=2)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    state = mapping_state(args.keys)
+    assert EVMState.load(state.dump()).details() == state.copy().details()
+
+    round_trip = min(timeit.repeat(lambda: EVMState.load(state.dump()), number=args.number, repeat=3))
+    structural = min(timeit.repeat(lambda: state.copy(), number=args.number, repeat=3))
+    print(f"dump/load round-trip {round_trip / args.number * 1e6:8.2f} us per copy")
+    print(f"EVMState.copy        {structural / args.number * 1e6:8.2f} us per copy")
+    print(f"speedup              {round_trip / structural:8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+    Offline replay of the queries recorded by `static_analysis --record-queries`, latency percentiles per theory, timeout and tactic
+
+    The queries are translated into each theory (the recorded one by default) with its assumptions on the variables,
+    and solved by a plain solver (`default`) or by the solver of a z3 tactic (e.g. `qfnia`, `qfbv`, `smt`).
+    The verdicts are compared with the recorded ones, an unknown on either side is not a disagreement.
+
+    python -m benchmarks.smt_replay <working_dir>/smt2_queries [--theories recorded,int,bv,hybrid] [--timeouts 100,1000] [--tactics default,qfnia]
+"""
+import argparse
+import glob
+import math
+import os
+import time
+from functools import reduce
+from typing import *
+
+import z3
+
+from disco.common.structures.tac_tree import fold_tree
+from disco.solver.recorder import STATUS, read_header
+from disco.solver.smt import Theory, get_theory
+
+_BINARY = {
+    z3.Z3_OP_ADD:"ADD", z3.Z3_OP_SUB:"SUB", z3.Z3_OP_MUL:"MUL", z3.Z3_OP_IDIV:"DIV", z3.Z3_OP_MOD:"MOD",
+    z3.Z3_OP_LT:"LT", z3.Z3_OP_GT:"GT", z3.Z3_OP_EQ:"EQ",
+    z3.Z3_OP_BADD:"ADD", z3.Z3_OP_BSUB:"SUB", z3.Z3_OP_BMUL:"MUL", z3.Z3_OP_BUDIV:"DIV", z3.Z3_OP_BSDIV:"SDIV",
+    z3.Z3_OP_BUREM:"MOD", z3.Z3_OP_ULT:"LT", z3.Z3_OP_UGT:"GT", z3.Z3_OP_SLT:"SLT", z3.Z3_OP_SGT:"SGT",
+}
+"""z3 operators of the recorded queries -> names of the operations of the theories"""
+_NEGATED = {z3.Z3_OP_LE:"GT", z3.Z3_OP_GE:"LT", z3.Z3_OP_ULEQ:"GT", z3.Z3_OP_UGEQ:"LT", z3.Z3_OP_DISTINCT:"EQ"}
+"""z3 operators -> the operation they negate"""
+
+def translate(e:z3.ExprRef, theory:Theory) -> z3.ExprRef:
+    """`e` in `theory`, the operations are the ones `smt.smt_from_tree` generates"""
+    funcs = theory.funcs(theory.unsigned)
+
+    def word(x):
+        return theory.const(x) if isinstance(x, int) else x
+
+    def children(node:z3.ExprRef):
+        return node.children() if z3.is_app(node) and not z3.is_const(node) else []
+
+    def combine(node:z3.ExprRef, sons, args):
+        if z3.is_int_value(node) or z3.is_bv_value(node):
+            return node.as_long()
+        if z3.is_true(node) or z3.is_false(node):
+            return z3.BoolVal(z3.is_true(node))
+        if z3.is_const(node):
+            return theory.var(node.decl().name())
+        kind = node.decl().kind()
+        if kind in _BINARY:
+            return reduce(funcs[_BINARY[kind]], args)
+        if kind in _NEGATED:
+            return z3.Not(funcs[_NEGATED[kind]](*args))
+        if kind == z3.Z3_OP_BSHL and isinstance(args[1], int):
+            return funcs["MUL"](args[0], 1 << args[1])
+        if kind == z3.Z3_OP_UMINUS:
+            return funcs["SUB"](0, args[0])
+        if kind == z3.Z3_OP_NOT:
+            return z3.Not(args[0])
+        if kind == z3.Z3_OP_AND:
+            return z3.And(*args)
+        if kind == z3.Z3_OP_OR:
+            return z3.Or(*args)
+        if kind == z3.Z3_OP_ITE:
+            return z3.If(args[0], word(args[1]), word(args[2]))
+        raise NotImplementedError(f"{node.decl()} is not translated")
+
+    r = fold_tree(e, children, combine)
+    return z3.BoolVal(bool(r)) if isinstance(r, (bool, int)) else r
+
+def make_solver(tactic:str, timeout:int) -> z3.Solver:
+    solver = z3.Solver() if tactic == "default" else z3.Tactic(tactic).solver()
+    solver.set("timeout", timeout)
+    return solver
+
+def percentile(values:Sequence[float], p:float) -> float:
+    """Nearest-rank percentile of sorted `values`"""
+    if len(values) == 0:
+        return 0.0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of the recorded .smt2 files")
+    parser.add_argument("--theories", default="recorded")
+    parser.add_argument("--timeouts", default="1000", help="ms, comma separated")
+    parser.add_argument("--tactics", default="default")
+    parser.add_argument("--limit", type=int, default=None, help="replay the first queries only")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, "*.smt2")))[:args.limit]
+    queries = []
+    for path in paths:
+        header = read_header(path)
+        queries.append((header.get("theory", "int"), header.get("status", "unknown"), list(z3.parse_smt2_file(path))))
+    print(f"{len(queries)} queries from {args.corpus}")
+
+    print(f"{'theory':8} {'timeout':>7} {'tactic':10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'total s':>8} "
+          f"{'sat':>5} {'unsat':>5} {'unkn':>5} {'untr':>5} {'disagr':>6}")
+    for theory_name in args.theories.split(","):
+        for timeout in (int(timeout) for timeout in args.timeouts.split(",")):
+            for tactic in args.tactics.split(","):
+                latencies = []
+                counts = {status:0 for status in STATUS.values()}
+                untranslated = disagreements = 0
+                for recorded_theory, status, assertions in queries:
+                    theory = get_theory(recorded_theory if theory_name == "recorded" else theory_name)
+                    try:
+                        constraints = [theory.assume(translate(e, theory)) for e in assertions]
+                    except (NotImplementedError, z3.Z3Exception):
+                        untranslated += 1
+                        continue
+                    solver = make_solver(tactic, timeout)
+                    solver.add(*constraints)
+                    start = time.perf_counter()
+                    verdict = STATUS[solver.check().r]
+                    latencies.append(time.perf_counter() - start)
+                    counts[verdict] += 1
+                    if "unknown" not in (verdict, status) and verdict != status:
+                        disagreements += 1
+                latencies.sort()
+                print(f"{theory_name:8} {timeout:7} {tactic:10} " +
+                      " ".join(f"{percentile(latencies, p) * 1e3:8.2f}" for p in (50, 90, 99, 100)) +
+                      f" {sum(latencies):8.2f} {counts['sat']:5} {counts['unsat']:5} {counts['unknown']:5} {untranslated:5} {disagreements:6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+    Feasibility checks of the path constraints of a contract in each SMT theory, solve time and verdicts against a reference theory
+
+    The constraints are recorded while the static analysis of the contract runs (with the `int` checker), then replayed
+    path by path on a fresh checker per theory. `bv` is the exact EVM arithmetic, so it is the default reference:
+    an `unsat` where the reference says `sat` drops a feasible path (unsound), the converse only misses a pruning.
+
+    python -m benchmarks.smt_theories --address <contract_address> [--working-dir ./] [--theories int,bv,hybrid] [--reference bv]
+"""
+import argparse
+import time
+from typing import *
+
+import z3
+
+from disco.common.structures.evm_variable import EVMState
+from disco.common.structures.tac_tree import OpTree
+from disco.solver.checker import Decision, Label, PathChecker
+from disco.solver.smt import THEORIES, SMTTranslator
+from disco.static_analyzer.static_analyzer import static_analyzer
+
+class RecordingChecker(PathChecker):
+    """The `int` checker of the analysis, recording the translations of the constraints of every path in each theory"""
+    def __init__(self, theories:Sequence[str]) -> None:
+        self.translators = {name:SMTTranslator(name) for name in theories}
+        self.paths:List[List[Tuple[str, Any]]] = []
+        """Per path, ("push", ({theory: constraint or None if untranslatable}, label)) and ("check", (decisions, behaviors)) events"""
+        super().__init__()
+
+    def reset(self):
+        super().reset()
+        self.paths.append([])
+
+    def _record(self, translate:Callable[[SMTTranslator], z3.ExprRef], label:Label=None):
+        constraints = dict()
+        for name, translator in self.translators.items():
+            try:
+                constraints[name] = translate(translator)
+            except Exception:
+                constraints[name] = None
+        self.paths[-1].append(("push", (constraints, label)))
+
+    def add_constraint(self, condTree:OpTree, label:Label=None):
+        self._record(lambda translator: translator.translate(condTree)[0], label)
+        super().add_constraint(condTree, label)
+
+    def add_sstore(self, key:EVMState, value:OpTree):
+        name = f"{key.details(with_counts=True, with_keys=True)}"
+        self._record(lambda translator: translator.var(name) == translator.translate(value)[0])
+        super().add_sstore(key, value)
+
+    def check(self, current_path_pres:Sequence[Decision]=(), behaviors:Optional[Sequence[str]]=None):
+        self.paths[-1].append(("check", (tuple(current_path_pres), behaviors)))
+        return super().check(current_path_pres, behaviors)
+
+def replay(paths:List[List[Tuple[str, Any]]], theory:str) -> Tuple[float, List[Optional[int]]]:
+    """Total time of the checks and their verdicts, None for the checks of the paths with an untranslatable constraint"""
+    checker = PathChecker(theory=theory)
+    elapsed = 0.0
+    verdicts = []
+    for events in paths:
+        checker.reset()
+        translated = True
+        for kind, arg in events:
+            if kind == "push":
+                constraints, label = arg
+                if constraints[theory] is None:
+                    translated = False
+                elif translated:
+                    checker.push_to_solver(constraints[theory], label=label)
+            elif not translated:
+                verdicts.append(None)
+            else:
+                start = time.perf_counter()
+                verdicts.append(checker.check(*arg))
+                elapsed += time.perf_counter() - start
+    return elapsed, verdicts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", required=True)
+    parser.add_argument("--working-dir", default="./")
+    parser.add_argument("--theories", default=",".join(THEORIES))
+    parser.add_argument("--reference", default="bv")
+    args = parser.parse_args()
+
+    theories = args.theories.split(",")
+    if args.reference not in theories:
+        theories.append(args.reference)
+    recorder = RecordingChecker(theories)
+    static_analyzer(args.address, args.working_dir, checker=recorder)
+    paths = [events for events in recorder.paths if any(kind == "check" for kind, _ in events)]
+    print(f"{len(paths)} paths, {sum(kind == 'push' for events in paths for kind, _ in events)} constraints, "
+          f"{sum(kind == 'check' for events in paths for kind, _ in events)} checks")
+
+    results = {theory:replay(paths, theory) for theory in theories}
+    _, reference = results[args.reference]
+    print(f"{'theory':8} {'time (ms)':>10} {'checks':>7} {'untransl':>8} {'agree':>7} {'unsound':>8} {'missed':>7}")
+    for theory in theories:
+        elapsed, verdicts = results[theory]
+        both = [(v, r) for v, r in zip(verdicts, reference) if v is not None and r is not None]
+        agree = sum(v == r for v, r in both)
+        unsound = sum(v == -1 and r == 1 for v, r in both)
+        missed = sum(v == 1 and r == -1 for v, r in both)
+        untranslated = sum(v is None for v in verdicts)
+        print(f"{theory:8} {elapsed * 1e3:10.1f} {len(verdicts):7} {untranslated:8} {agree:7} {unsound:8} {missed:7}")
+
+if __name__ == "__main__":
+    main()
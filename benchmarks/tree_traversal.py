@@ -0,0 +1,64 @@
+"""
+    Traversals of OpTree on deep synthetic trees, e.g. arithmetic chains of unrolled loops and ABI decoding
+
+    python -m benchmarks.tree_traversal [--depth 20000] [--repeat 5]
+"""
+import argparse
+import sys
+import time
+
+from disco.common.structures.tac_tree import OpTree, tree_cast_removal, unshared_tree
+from disco.common.utils.dump_load_utils import deserialize_tree, serialize_tree
+from disco.common.utils.extractor_utils import sat_tree
+from disco.solver.smt import smt_from_tree
+
+def chain_tree(depth:int) -> OpTree:
+    """((CALLVALUE + 0x1) + 0x2) + ..., `depth` nodes deep"""
+    tree = OpTree("CALLVALUE")
+    for i in range(depth):
+        tree = OpTree("ADD", [tree, OpTree.from_value(i + 1)])
+    return OpTree("GT", [tree, OpTree.from_value(0)])
+
+def cast_tree(depth:int) -> OpTree:
+    """nested bool/uint casts of CALLER"""
+    tree = OpTree("CALLER")
+    for i in range(depth):
+        tree = OpTree("AND", [OpTree.from_value(2**160 - 1), tree]) if i % 2 else OpTree("ISZERO", OpTree("ISZERO", tree))
+    return tree
+
+def balanced_tree(height:int) -> OpTree:
+    if height == 0:
+        return OpTree("CALLDATASIZE")
+    return OpTree("MUL", [balanced_tree(height - 1), balanced_tree(height - 1)])
+
+def measure(name:str, func, repeat:int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    print(f"{name:32s} best {min(timings)*1000:10.2f} ms   mean {sum(timings)/len(timings)*1000:10.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=20000)
+    parser.add_argument("--height", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"recursion limit {sys.getrecursionlimit()}, chain depth {args.depth}, balanced height {args.height}")
+    for tree_name, tree in (("chain", chain_tree(args.depth)), ("balanced", balanced_tree(args.height))):
+        measure(f"{tree_name}: details", lambda: tree.details(), args.repeat)
+        measure(f"{tree_name}: smt_from_tree", lambda: smt_from_tree(tree), args.repeat)
+        measure(f"{tree_name}: serialize_tree", lambda: serialize_tree(tree), args.repeat)
+        data = serialize_tree(tree)
+        measure(f"{tree_name}: deserialize_tree", lambda: deserialize_tree(data), args.repeat)
+        measure(f"{tree_name}: unshared_tree", lambda: unshared_tree(tree), args.repeat)
+        measure(f"{tree_name}: sat_tree", lambda: sat_tree(tree), args.repeat)
+        measure(f"{tree_name}: get_background", lambda: tree.get_background(), args.repeat)
+
+    tree = cast_tree(args.depth)
+    measure("cast: tree_cast_removal", lambda: tree_cast_removal(tree), args.repeat)
+
+if __name__ == "__main__":
+    main()
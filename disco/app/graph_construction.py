@@ -6,7 +6,7 @@ import json
 from graphviz import Digraph
 
 from disco.common.structures.evm_variable import EVMArg, EVMProperty, EVMState, EVMVariable
-from disco.common.structures.tac_tree import OpTree, expanded_condition_tree
+from disco.common.structures.tac_tree import OpTree, expanded_condition_tree, fold_tree
 from disco.common.structures.unit.behavior_element import Behavior
 from disco.common.structures.unit.condition_element import Condition
 from disco.common.structures.unit.semantic_unit import SemanticUnit
@@ -126,9 +126,30 @@ def depict_evm_variable(evm_variable:EVMVariable, call_returns=None) -> Tuple[No
         EVM_Variable2Node[str_evm_variable] = rootNode
         return rootNode, edges
 
-def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
-    if call_returns is None: call_returns = dict()
-    """return the root node and edges"""
+def _depicted_sons(optree:OpTree) -> List[OpTree]:
+    """the subtrees depicted below the node of optree, in the order of `_depict_node`"""
+    if optree.alias_evm_variable is not None or optree.name.startswith("0x") or optree.name == "0":
+        return []
+    elif ("RETURN" in optree.name and "CALL" in optree.name) or "CALLDATACOPY" in optree.name:
+        return []
+    elif len(optree.sons) == 1:
+        if optree.name == "ISZERO":
+            son = optree.sons[0]
+            if son.name == "ISZERO":
+                return [son.sons[0]]
+            elif son.name in SYMBOL_MAPPING_COMPARISON_REV:
+                return [son.sons[0], son.sons[1]]
+            else:
+                return [son]
+        else:
+            return [optree.sons[0]]
+    elif len(optree.sons) == 2 and (optree.name in SYMBOL_MAPPING_COMPARISON or optree.name in SYMBOL_MAPPING_ARITH):
+        return [optree.sons[0], optree.sons[1]]
+    else:
+        return []
+
+def _depict_node(optree:OpTree, call_returns, depicted:List[Tuple[Node, List[Edge]]]) -> Tuple[Node, List[Edge]]:
+    """return the root node and edges, `depicted` are the depictions of `_depicted_sons`"""
     if optree.alias_evm_variable is not None:
         return depict_evm_variable(optree.alias_evm_variable, call_returns)
     elif optree.name.startswith("0x") or optree.name == "0":
@@ -163,7 +184,7 @@ def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
                 son = optree.sons[0]
                 if son.name == "ISZERO":
                     rootNode = Node("!=", NodeType.OP_COMPARISON)
-                    lNode, _edges = depict_optree(son.sons[0], call_returns)
+                    lNode, _edges = depicted[0]
                     rNode = Node(str("0x0"), NodeType.OBJ_CONST)
                     edges.extend(_edges)
                     edges.append(Edge(lNode, rootNode))
@@ -172,8 +193,8 @@ def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
 
                 elif son.name in SYMBOL_MAPPING_COMPARISON_REV:
                     rootNode = Node(SYMBOL_MAPPING_COMPARISON_REV[son.name], NodeType.OP_COMPARISON)
-                    lNode, ledges = depict_optree(son.sons[0], call_returns)
-                    rNode, redges = depict_optree(son.sons[1], call_returns)
+                    lNode, ledges = depicted[0]
+                    rNode, redges = depicted[1]
 
                     edges.extend(ledges)
                     edges.extend(redges)
@@ -184,7 +205,7 @@ def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
 
                 else:
                     rootNode = Node("==", NodeType.OP_COMPARISON)
-                    lNode, _edges = depict_optree(son, call_returns)
+                    lNode, _edges = depicted[0]
                     rNode = Node(str(0), NodeType.OBJ_CONST)
                     edges.extend(_edges)
                     edges.append(Edge(lNode, rootNode))
@@ -192,7 +213,7 @@ def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
                     return rootNode, edges
             else:
                 rootNode = Node(optree.name, NodeType.OP_COMPARISON)
-                lNode, _edges = depict_optree(optree.sons[0], call_returns)
+                lNode, _edges = depicted[0]
                 edges.extend(_edges)
                 
                 edges.append(Edge(lNode, rootNode))
@@ -209,8 +230,8 @@ def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
                     
                 rootNode = Node(rootName, node_type)
                 
-                lNode, ledges = depict_optree(optree.sons[0], call_returns)
-                rNode, redges = depict_optree(optree.sons[1], call_returns)
+                lNode, ledges = depicted[0]
+                rNode, redges = depicted[1]
 
                 edges.extend(ledges)
                 edges.extend(redges)
@@ -226,6 +247,12 @@ def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
             return Node(str(optree), NodeType.OP_UNK), []
             # raise OutOfRulesException()
 
+def depict_optree(optree:OpTree, call_returns=None) -> Tuple[Node, List[Edge]]:
+    if call_returns is None: call_returns = dict()
+    """return the root node and edges"""
+    # the sons are depicted before their father, without recursion
+    return fold_tree(optree, _depicted_sons, lambda node, sons, depicted: _depict_node(node, call_returns, depicted))
+
 def depict_condition(condition:Condition) -> List[Edge]:
     condition_node, edges = depict_optree(expanded_condition_tree(condition.optree), call_returns=condition.depend_calls)
     
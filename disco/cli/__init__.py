@@ -8,6 +8,8 @@ from disco.cli.build_graph import build_graph
 
 from disco.cli.description_generation import description_generation
 
+from disco.cli.sha3_table import build_sha3_table
+
 @click.group()
 @click.version_option(version='0.0.1')
 @click.pass_context
@@ -19,4 +21,6 @@ cli.add_command(transaction_analysis, "transaction_analysis")
 
 cli.add_command(build_graph, "build_graph")
 
-cli.add_command(description_generation, "description_generation")
\ No newline at end of file
+cli.add_command(description_generation, "description_generation")
+
+cli.add_command(build_sha3_table, "build_sha3_table")
\ No newline at end of file
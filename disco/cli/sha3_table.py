@@ -0,0 +1,22 @@
+import click
+
+from disco.common.utils.lifting_utils import SHA3_TABLE_PATH
+from disco.common.utils.sha3_table import (generate_preimages,
+                                           load_json_preimages, write_table)
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('-o', '--output', default=SHA3_TABLE_PATH,
+              help='The path of the preimage table.')
+@click.option('-s', '--slots', default=256, type=int,
+              help='Storage slots covered by array bases and mappings.')
+@click.option('-k', '--keys', default=256, type=int,
+              help='Mapping keys covered for each slot.')
+@click.option('--from-json', default=None, type=str,
+              help='Convert a sha3_mappings.json instead of generating the preimages.')
+def build_sha3_table(output, slots, keys, from_json):
+    if from_json is not None:
+        preimages = load_json_preimages(from_json)
+    else:
+        preimages = generate_preimages(slots, keys)
+    count = write_table(output, preimages)
+    click.echo(f"{count} preimages written to {output}")
@@ -1,10 +1,26 @@
 import click
 
+from disco.solver.smt import THEORIES
 from disco.static_analyzer.static_analyzer import static_analyzer
 
 @click.command(context_settings=dict(help_option_names=['-h', '--help']))
 @click.option('-a', '--address', required=True, type=str,
               help='The address of the contract.')
 @click.option('-w', '--working_dir', default="./")
-def static_analysis(address, working_dir):
-    static_analyzer(address, working_dir)
\ No newline at end of file
+@click.option('--smt-theory', type=click.Choice(list(THEORIES)), default="int",
+              help='Encoding of the EVM words in the feasibility checks.')
+@click.option('--solver-timeout', type=float, default=None,
+              help='Solver budget of the contract in seconds, the checks past it are taken as feasible.')
+@click.option('--query-timeouts', type=(int, int), default=(100, 1000), show_default=True,
+              help='Initial and maximal timeouts of a query in ms, escalated for the queries guarding new behaviors.')
+@click.option('--feasibility-cache', type=click.Path(dir_okay=False), default=None,
+              help='SQLite file caching the verdicts of the feasibility checks across contracts.')
+@click.option('--record-queries', is_flag=True, default=False,
+              help='Write the queries solved by z3 as SMT-LIB2 files under <working_dir>/smt2_queries.')
+@click.option('--codecopy-constants', is_flag=True, default=False,
+              help='Lift the CODECOPY of constant ranges into the words of the bytecode.')
+def static_analysis(address, working_dir, smt_theory, solver_timeout, query_timeouts, feasibility_cache, record_queries, codecopy_constants):
+    static_analyzer(address, working_dir, smt_theory=smt_theory,
+                    solver_timeout=solver_timeout, feasibility_cache=feasibility_cache,
+                    query_timeouts=query_timeouts, record_queries=record_queries,
+                    codecopy_constants=codecopy_constants)
\ No newline at end of file
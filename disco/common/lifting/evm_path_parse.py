@@ -21,6 +21,15 @@ def _path_illegal(block, next_block:str):
             return cond_const != int(next_block == hex(dest_const))
     return False
 
+def code_buffer(code) -> T.Optional[memoryview]:
+    """Wrap the contract bytecode (hex string or bytes) into a read-only memoryview"""
+    if code is None or isinstance(code, memoryview):
+        return code
+    if isinstance(code, str):
+        code = code[2:] if code.startswith("0x") else code
+        code = bytes.fromhex(code if len(code) % 2 == 0 else code + "0")
+    return memoryview(code).toreadonly()
+
 def transform_from_evm_path(evm_path:EVMPath, debug:bool=False, cfg=None, code=None) -> TACPath:
     tac_path = TACPath.from_evm_path(evm_path=evm_path)
     memory_affected = False
@@ -118,7 +127,8 @@ class Destackifier:
         self.ext_calls = 0
         
         self.debug_file = debug_file
-        self.code = code
+        # Read-only view over the contract bytecode, shared by every copy of this destackifier
+        self.code = code_buffer(code)
 
     def __fresh_init(self, evm_block: EVMCfg.EVMBasicBlock) -> None:
         """Reinitialise all structures in preparation for converting a block."""
@@ -269,14 +279,8 @@ class Destackifier:
             length = TACArg.from_var(length)
             inst = TACOp(op.opcode, [dstoffset,offset,length], op.pc)
 
-            if self.code is not None and offset.value.is_const and length.value.is_const:
-                if self.code.startswith("0x"):
-                    self.code = self.code[2:]
-                value = self.code[offset.value.const_value*2:offset.value.const_value*2+length.value.const_value*2]
-                for i in range(length.value.const_value//32):
-                    o = MemT.Variable(value=dstoffset.value.const_value+i*32, name="C")
-                    self.memory.mstore(offset=o, value=MemT.Variable(value=int(value[i*64:i*64+64], 16), name="C"))
-                # self.memory.mstore(offset=dstoffset.value, value=MemT.Variable(value=value, name="C"), length=length.value)
+            if self.code is not None and dstoffset.value.is_const and offset.value.is_const and length.value.is_const:
+                self.memory.codecopy(dstoffset.value.const_value, self.code, offset.value.const_value, length.value.const_value//32)
             else:
                 self.memory.mstore(offset=dstoffset.value, value=EVMMemory.DynamicVariable(MemT.Variable(name=f"CODECOPY@{hex(op.pc)}"), offset=offset.value, length=length.value), length=length.value)
 
@@ -418,4 +422,5 @@ class Destackifier:
                           stack=copy.deepcopy(self.stack), 
                           memory=copy.deepcopy(self.memory), 
                           block_entry=self.block_entry, 
-                          stack_vars=self.stack_vars)
+                          stack_vars=self.stack_vars,
+                          code=self.code)
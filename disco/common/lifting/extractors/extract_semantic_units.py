@@ -1,4 +1,6 @@
 from collections import defaultdict
+from functools import reduce
+from operator import or_
 from typing import *
 
 import disco.common.structures.opcodes as Opcodes
@@ -48,12 +50,36 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
         if evm_analyzer.checker is None:
             evm_analyzer.checker = PathChecker()
         checker = evm_analyzer.checker
-        current_path_idents = ""
+        current_path_idents:List[Tuple[str,int]] = []
     
     conditions_list:List[Condition] = []    
     semantic_units:List[SemanticUnit] = []
     
-    var_conditions_dep:Dict[str, Set[Condition]] = dict()
+    # the conditions of the path are numbered when a dependency first takes them, the dependencies are bitsets of their numbers
+    path_conditions:List[Condition] = []
+    condition_bits:Dict[Condition, int] = dict()
+    var_conditions_dep:Dict[str, int] = dict()
+    # dependencies shared by every op under the active conditions, None when `conditions_list` or the dependencies of their variables change
+    active_conditions_dep:Optional[int] = None
+    active_vars:Set[str] = set()
+
+    def bit_of(condition:Condition) -> int:
+        bit = condition_bits.get(condition)
+        if bit is None:
+            bit = condition_bits[condition] = 1 << len(path_conditions)
+            path_conditions.append(condition)
+        return bit
+
+    def conditions_of(mask:int) -> List[Condition]:
+        """The conditions of a bitset, in the order of the path"""
+        conditions = []
+        while mask:
+            low = mask & -mask
+            conditions.append(path_conditions[low.bit_length() - 1])
+            mask ^= low
+        return conditions
+    # subtrees shared by the trees built on this path
+    tree_memo = dict()
     # with_optimized = False
     sha3_optimized = False
     sstore_optimized = False
@@ -61,26 +87,30 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
 
     for block_idx, block in enumerate(tac_path.tac_blocks[tac_path.entry_index:]):
         update_conditions(conditions_list, block, exit_blocks)        
+        active_conditions_dep = None
 
         for tac_op in block.tac_ops:
             # update var condition dependency
             if hasattr(tac_op, 'lhs') and tac_op.lhs is not None:
                 # if tac_op.lhs.identifier == 'V119@0x104@0xc5':
                 #     print()
-                may_conditions = set()
-                
-                for condition in conditions_list:
-                    if not condition in may_conditions:
-                        may_conditions.add(condition)
-                        
-                    for use_var in [condition.dst_var, condition.cond_var]:
-                        may_conditions |= var_conditions_dep[use_var.value.identifier]
+                if active_conditions_dep is None:
+                    active_conditions_dep = 0
+                    active_vars = set()
+                    for condition in conditions_list:
+                        active_conditions_dep |= bit_of(condition)
+                        for use_var in [condition.dst_var, condition.cond_var]:
+                            active_conditions_dep |= var_conditions_dep[use_var.value.identifier]
+                            active_vars.add(use_var.value.identifier)
+                may_conditions = active_conditions_dep
 
                 for arg in tac_op.args:
                     if arg.value.def_sites is not None:
                        may_conditions |= var_conditions_dep[arg.value.identifier] 
                        
                 var_conditions_dep[tac_op.lhs.identifier] = may_conditions
+                if tac_op.lhs.identifier in active_vars:
+                    active_conditions_dep = None
                 
                 # for condition in may_conditions:
                 #     if condition not in conditions_list:
@@ -109,9 +139,9 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     continue
                 
                 if check_feasibility:
-                    current_path_idents += f"{str(block.ident())}-{int(need_opposite)}"
+                    current_path_idents.append((str(block.ident()), int(need_opposite)))
                 
-                condTree = tree_from_variable(cond.value, need_opposite=need_opposite)
+                condTree = tree_from_variable(cond.value, need_opposite=need_opposite, memo=tree_memo)
             
                 sha3_optimized |= condTree.with_optimized
                 
@@ -126,6 +156,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                 condition.set_cstates(condTree.cstates)
 
                 conditions_list.append(condition)
+                active_conditions_dep = None
 
                 if condition.get_cstate("check_on_calls") or condition.get_cstate("check_on_creates") or condition.get_cstate("check_on_selfdestruct"):
                     conditions_list.pop()
@@ -149,7 +180,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     condition.optree = expanded_condition_tree(condTree_alias)
                     
                     if check_feasibility:
-                        checker.add_constraint(condition.optree)
+                        checker.add_constraint(condition.optree, label=(condition.condition_pc, int(need_opposite)))
                     
                     continue
                 
@@ -176,7 +207,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                                         break
                     
                     if check_feasibility:
-                        checker.add_constraint(condition.optree)
+                        checker.add_constraint(condition.optree, label=(condition.condition_pc, int(need_opposite)))
                     
                     continue
                 else:
@@ -185,7 +216,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     condition.optree = expanded_condition_tree(condTree_alias)
                     
                     if check_feasibility:
-                        checker.add_constraint(condition.optree)
+                        checker.add_constraint(condition.optree, label=(condition.condition_pc, int(need_opposite)))
 
                     continue
             
@@ -197,7 +228,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                                    Opcodes.SELFDESTRUCT]:
                 if check_feasibility and checker.after_add_constraints:
                     checker.after_add_constraints = False
-                    check_res = checker.check(current_path_idents)                
+                    check_res = checker.check(current_path_idents, behaviors=[hex(tac_op.pc)])
                 
                     if check_res == -1:
                         # if debug:
@@ -207,13 +238,13 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                                 
                 _condition_lists = conditions_list[:]
                 for arg in tac_op.args + tac_op.values:
-                    for c in var_conditions_dep.get(arg.value.name,[]):
+                    for c in conditions_of(var_conditions_dep.get(arg.value.name, 0)):
                         if not c in _condition_lists:
                             _condition_lists.append(c)
                 for c in conditions_list[:]:
                     alias_evm_variable = c.optree.contained_evm_states
                     for s in alias_evm_variable:
-                        for _c in var_conditions_dep.get(str(s), []):
+                        for _c in conditions_of(var_conditions_dep.get(str(s), 0)):
                             if not _c in _condition_lists:
                                 _condition_lists.append(_c)
                 
@@ -223,7 +254,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     #     print()
                     
                     slot_key, slot_value = tac_op.args
-                    slot_key_tree, slot_value_tree = tree_from_variable(slot_key.value), tree_from_variable(slot_value.value)
+                    slot_key_tree, slot_value_tree = tree_from_variable(slot_key.value, memo=tree_memo), tree_from_variable(slot_value.value, memo=tree_memo)
 
                     sha3_optimized |= slot_key_tree.with_optimized
                     sha3_optimized |= slot_value_tree.with_optimized
@@ -260,7 +291,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                             if check_feasibility:
                                 checker.add_sstore(update_evm_state, update_value_alias)
 
-                            var_conditions_dep[str(update_evm_state)] = _condition_lists
+                            var_conditions_dep[str(update_evm_state)] = reduce(or_, map(bit_of, _condition_lists), 0)
 
                             # _condition_lists = [deepcopy(_c) for _c in conditions_list]
                             # _condition_lists = conditions_list
@@ -298,7 +329,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                         if isinstance(value, str):
                             valueTree = tree_from_variable(int("0x"+value,16))
                         else:
-                            valueTree = tree_from_variable(value.value)
+                            valueTree = tree_from_variable(value.value, memo=tree_memo)
                         sha3_optimized |= valueTree.with_optimized
                         valueTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(valueTree)
               
@@ -310,7 +341,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                                 if isinstance(arg, str):
                                     argTree = tree_from_variable(int("0x"+arg,16))
                                 else:
-                                    argTree = tree_from_variable(arg.value)
+                                    argTree = tree_from_variable(arg.value, memo=tree_memo)
                                 sha3_optimized |= argTree.with_optimized
                                 argTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(argTree)
                                 _args.append(argTree_alias)
@@ -334,7 +365,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                                 if isinstance(arg, str):
                                     argTree = tree_from_variable(int("0x"+arg,16))
                                 else:
-                                    argTree = tree_from_variable(arg.value)
+                                    argTree = tree_from_variable(arg.value, memo=tree_memo)
                                 sha3_optimized |= argTree.with_optimized
                                 argTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(argTree)
                                 _args.append(argTree_alias)
@@ -345,7 +376,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     if isinstance(addr, str):
                         addrTree = tree_from_variable(int("0x"+addr,16))
                     else:
-                        addrTree = tree_from_variable(addr.value)
+                        addrTree = tree_from_variable(addr.value, memo=tree_memo)
                     sha3_optimized |= addrTree.with_optimized
                     
                     addrTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(addrTree)
@@ -387,7 +418,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     if isinstance(value, str):
                         valueTree = tree_from_variable(int("0x"+value,16))
                     else:
-                        valueTree = tree_from_variable(value.value)
+                        valueTree = tree_from_variable(value.value, memo=tree_memo)
                     sha3_optimized |= valueTree.with_optimized
                     valueTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(valueTree)
 
@@ -400,7 +431,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                             if isinstance(arg, str):
                                 argTree = tree_from_variable(int("0x"+arg,16))
                             else:
-                                argsTree = tree_from_variable(arg.value)
+                                argsTree = tree_from_variable(arg.value, memo=tree_memo)
                             sha3_optimized |= argsTree.with_optimized
                             argsTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(argsTree)
 
@@ -412,7 +443,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                             if isinstance(arg, str):
                                 argTree = tree_from_variable(int("0x"+arg,16))
                             else:
-                                argsTree = tree_from_variable(arg.value)
+                                argsTree = tree_from_variable(arg.value, memo=tree_memo)
                             sha3_optimized |= argsTree.with_optimized
                             argsTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(argsTree)
 
@@ -422,7 +453,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                         if isinstance(salt, str):
                             saltTree = tree_from_variable(int("0x"+salt,16))
                         else:
-                            saltTree = tree_from_variable(salt.value)
+                            saltTree = tree_from_variable(salt.value, memo=tree_memo)
                         sha3_optimized |= saltTree.with_optimized
                         saltTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(saltTree)
 
@@ -451,7 +482,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     if isinstance(addr, str):
                         addrTree = tree_from_variable(int("0x"+addr,16))
                     else:
-                        addrTree = tree_from_variable(addr.value)
+                        addrTree = tree_from_variable(addr.value, memo=tree_memo)
                     sha3_optimized |= addrTree.with_optimized
                     
                     addrTree_alias = evm_analyzer.set_alias_evm_variable_for_tree(addrTree)
@@ -473,7 +504,7 @@ def extract_semantic_units(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, c
                     semantic_units.append(_semantic_unit)
     
     if check_feasibility:
-        check_res = checker.check(current_path_idents)                
+        check_res = checker.check(current_path_idents, behaviors=[pc for su in semantic_units for pc in su.behavior.behavior_pcs])
     
         if check_res == -1:
             tac_path.illegal = True
@@ -6,8 +6,8 @@ from disco.common.structures.evm_variable import EVMArg, EVMProperty, EVMState
 from disco.common.structures.tac_path import TACPath
 from disco.common.structures.tac_tree import tree_from_variable
 
-def valid_forward_chains(forward_chains):
-    return not any(forward_chain.opcode.name in ["LT","GT","SLT","SGT","EQ"] for forward_chain in forward_chains)        
+COMPARISON_OPS = ("LT","GT","SLT","SGT","EQ")
+"""Values flowing through a comparison are not returned as they are"""
 
 def valid_evm_states(evm_states:List[EVMState], language:str="Solidity"):
     if len(evm_states) == 0: return False
@@ -30,23 +30,46 @@ def valid_evm_states(evm_states:List[EVMState], language:str="Solidity"):
     return True
 
 # indeed: forward analysis
-def dfs_chains(tac_op, forward_chain:List, forward_chains:List):
-    forward_chain.append(tac_op)
-    
-    use_sites = tac_op.lhs.use_sites
-   
-    # if the variable is not used anymore, the use_sites are None   
-    if use_sites is None or len(use_sites) < 1:
-        forward_chains.append(forward_chain.copy())
-    else:
-        for site in use_sites:
-            use_tac_op = site.get_instruction()
-            if hasattr(use_tac_op, 'lhs'):
-                dfs_chains(use_tac_op, forward_chain, forward_chains)
+def forward_sinks(tac_op, memo:Dict) -> List:
+    """
+        Sinks of the def-use chains starting at `tac_op` that do not go through a comparison, in the order of a depth-first walk.
+        A sink is the last op of a chain, its result is not used anymore or is used by an op without result (e.g., MSTORE, RETURN).
+        `memo` maps the visited ops to their sinks, it is shared by the walks of a path so every op is expanded once.
+    """
+    stack = [tac_op]
+    visiting = set()
+    while len(stack) > 0:
+        op = stack[-1]
+        if op in memo:
+            stack.pop()
+            continue
+        if op.opcode.name in COMPARISON_OPS:
+            memo[op] = []
+            stack.pop()
+            continue
+
+        use_ops = [site.get_instruction() for site in op.lhs.use_sites] if op.lhs.use_sites else []
+        if op not in visiting:
+            visiting.add(op)
+            pending = [use_op for use_op in use_ops if hasattr(use_op, 'lhs') and use_op not in memo and use_op not in visiting]
+            if len(pending) > 0:
+                stack.extend(reversed(pending))
+                continue
+        stack.pop()
+        visiting.discard(op)
+
+        # if the variable is not used anymore, the op ends the chain
+        if len(use_ops) == 0:
+            memo[op] = [op]
+            continue
+        sinks = dict()
+        for use_op in use_ops:
+            if hasattr(use_op, 'lhs'):
+                sinks.update(dict.fromkeys(memo.get(use_op, ())))
             else:
-                forward_chains.append(forward_chain.copy())
-                
-    forward_chain.pop()
+                sinks[op] = None
+        memo[op] = list(sinks)
+    return memo[tac_op]
 
 def extract_state_variables(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath, debug:bool=False):
     """Analysis the public state variables according to the non-state-affected paths.
@@ -57,30 +80,27 @@ def extract_state_variables(evm_analyzer:EVMVariableAnalyzer, tac_path:TACPath,
     evm_states = []
     if len(tac_path.tac_blocks) == 0: return None
     if not tac_path.tac_blocks[-1].tac_ops[-1].opcode == Opcodes.RETURN: return None
+    # subtrees shared by the trees built on this path
+    tree_memo = dict()
+    sinks_memo = dict()
     for block in tac_path.tac_blocks:
         for tac_op in block.tac_ops:
             if tac_op.opcode == Opcodes.SLOAD:
-                forward_chains = []
                 _evm_states = []
-                dfs_chains(tac_op, [], forward_chains)
-
-                for forward_chain in forward_chains:
-                    if not valid_forward_chains(forward_chain): continue
-                    last_tac_op = forward_chain[-1]
-                    evm_state_visiting_tree = tree_from_variable(last_tac_op.lhs)
+                for sink_tac_op in forward_sinks(tac_op, sinks_memo):
+                    evm_state_visiting_tree = tree_from_variable(sink_tac_op.lhs, memo=tree_memo)
                     if debug:
-                        print("\n".join([str(tac_op) for tac_op in forward_chain]) + f"\n{'='*20}\n")
+                        print(f"{tac_op} -> {sink_tac_op}\n{'='*20}\n")
                         evm_state_visiting_tree.vis_graph().render(f"ret_visit",format="svg",cleanup=True)
                     
-                    evm_state_visiting_tree_str = str(evm_state_visiting_tree)
-                    if evm_state_visiting_tree_str in evm_analyzer.has_analyzed_trees:
-                        evm_states.append(evm_analyzer.has_analyzed_trees[evm_state_visiting_tree_str])
+                    if evm_state_visiting_tree in evm_analyzer.has_analyzed_trees:
+                        evm_states.append(evm_analyzer.has_analyzed_trees[evm_state_visiting_tree])
 
                     sload_trees = evm_state_visiting_tree.get_all_sons(NAME="SLOAD")
                     for sload_tree in sload_trees:
                         evm_state, forward_tree = evm_analyzer.sload_analysis(sload_tree,copy_state_variable=False)                       
                         
-                        evm_analyzer.has_analyzed_trees[str(forward_tree)] = evm_state.copy()
+                        evm_analyzer.has_analyzed_trees[forward_tree] = evm_state.copy()
 
                         _evm_states.append(evm_state)
 
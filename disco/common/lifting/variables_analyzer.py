@@ -1,7 +1,7 @@
 import copy
 import json
 import os
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from typing import *
 
 from disco.common.exceptions.LiftingExceptions import OutOfRulesException
@@ -9,19 +9,105 @@ from disco.common.structures.evm_variable import (SIZE_IN_BYTES, EVMArg, EVMProp
                                                    EVMState, EVMType,
                                                    EVMVariable)
 from disco.common.structures.opcodes import BLOCK_TRANSACTION_PROPERTIES
-from disco.common.structures.tac_tree import OpTree, tree_cast_removal
+from disco.common.structures.tac_tree import OpTree, TreeKey, tree_cast_removal
 from disco.common.utils.lifting_utils import (compute_offset, hex2str, SHA3_MAPPING_PATH,
                                                is_numberic, numberic)
 
+ANALYZED_TREES_LIMIT = 65536
+"""Default bound of `AnalyzedTrees`, None for no bound"""
+
+_MISSING = object()
+
+def tree_key(tree:Union[OpTree,TreeKey,str]) -> Union[TreeKey,str]:
+    """Key of a tree in `AnalyzedTrees`, its structural key, the renderings are the keys of the dumped trees"""
+    return tree.key() if isinstance(tree, OpTree) else tree
+
+class AnalyzedTrees:
+    """
+        LRU cache of the EVM variables of analyzed trees, keyed by their structural keys (see `OpTree.key`).
+        The trees of a dump are keyed by their renderings, they are looked up by the renderings of the trees missing from the structural keys.
+    """
+    def __init__(self, trees:Dict=None, limit:Optional[int]=ANALYZED_TREES_LIMIT) -> None:
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._trees:OrderedDict[Union[TreeKey,str],EVMVariable] = OrderedDict()
+        self._rendered = 0
+        """Count of the keys that are renderings"""
+        if trees is not None:
+            for tree, evm_variable in trees.items():
+                self[tree] = evm_variable
+
+    def _find(self, tree:Union[OpTree,TreeKey,str]) -> Union[TreeKey,str,None]:
+        """The key of `tree` in the cache, None if it is missing"""
+        key = tree_key(tree)
+        if key in self._trees:
+            return key
+        if self._rendered > 0 and isinstance(tree, OpTree):
+            rendering = str(tree)
+            if rendering in self._trees:
+                return rendering
+        return None
+
+    def get(self, tree:Union[OpTree,TreeKey,str], default=None):
+        key = self._find(tree)
+        if key is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._trees.move_to_end(key)
+        return self._trees[key]
+
+    def __getitem__(self, tree:Union[OpTree,TreeKey,str]):
+        evm_variable = self.get(tree, _MISSING)
+        if evm_variable is _MISSING:
+            raise KeyError(tree)
+        return evm_variable
+
+    def __setitem__(self, tree:Union[OpTree,TreeKey,str], evm_variable) -> None:
+        key = tree_key(tree)
+        if isinstance(key, str) and key not in self._trees:
+            self._rendered += 1
+        self._trees[key] = evm_variable
+        self._trees.move_to_end(key)
+        if self.limit is not None and len(self._trees) > self.limit:
+            evicted, _ = self._trees.popitem(last=False)
+            if isinstance(evicted, str):
+                self._rendered -= 1
+            self.evictions += 1
+
+    def __contains__(self, tree:Union[OpTree,TreeKey,str]) -> bool:
+        return self._find(tree) is not None
+
+    def __len__(self) -> int:
+        return len(self._trees)
+
+    def items(self):
+        """(rendering of the tree, EVM variable)"""
+        for key, evm_variable in self._trees.items():
+            yield (key if isinstance(key, str) else key.render()), evm_variable
+
+    def stats(self) -> Dict[str,int]:
+        return {"size":len(self._trees), "hits":self.hits, "misses":self.misses, "evictions":self.evictions}
+
 class EVMVariables:
-    def __init__(self, evm_states:Set=None, evm_storage_dynamic_occupied:Dict=None, has_analyzed_trees:Dict=None, language:str="Solidity") -> None:
+    def __init__(self, evm_states:Set=None, evm_storage_dynamic_occupied:Dict=None, has_analyzed_trees:Dict=None, language:str="Solidity", analyzed_trees_limit:Optional[int]=ANALYZED_TREES_LIMIT) -> None:
         """EVM Variables Collections"""
         self.evm_states:Set[EVMState] = set() if evm_states is None else evm_states
         self.evm_storage_dynamic_occupied:Dict[int,bool] = defaultdict(bool) if evm_storage_dynamic_occupied is None else defaultdict(lambda:False, evm_storage_dynamic_occupied)
-        self.has_analyzed_trees:Dict[str,EVMVariable] = dict() if has_analyzed_trees is None else has_analyzed_trees
+        self.has_analyzed_trees:AnalyzedTrees = AnalyzedTrees(has_analyzed_trees, limit=analyzed_trees_limit)
 
         self.evm_args:Set[EVMArg] = set()
         self.evm_properties:Set[EVMProperty] = set()
+
+        # indexes of the collections above, the first added variable of a key is kept, as the sets do
+        self.evm_states_by_index:Dict[int,Dict[Tuple[int,int],EVMState]] = defaultdict(dict)
+        """slot index -> (offset, length) -> evm state"""
+        for evm_state in self.evm_states:
+            self.evm_states_by_index[evm_state.index].setdefault((evm_state.offset, evm_state.length), evm_state)
+        self.evm_args_by_index:Dict[int,EVMArg] = dict()
+        self.evm_properties_by_name:Dict[str,EVMProperty] = dict()
         
         self.language = language
 
@@ -35,42 +121,38 @@ class EVMVariables:
 
     def getEVMState(self, evm_state:EVMState):
         """get evm_state in the evm_states, same id"""
-        for _evm_state in self.evm_states:
-            if evm_state.index == _evm_state.index:
-                if self.evm_storage_dynamic_occupied[evm_state.index]:
-                    return _evm_state
-                elif evm_state.type is not None:
-                    if not evm_state.type.is_dynamic and _evm_state == evm_state:
+        same_index_states = self.evm_states_by_index.get(evm_state.index)
+        if same_index_states:
+            if self.evm_storage_dynamic_occupied[evm_state.index]:
+                return next(iter(same_index_states.values()))
+            elif evm_state.type is not None:
+                if not evm_state.type.is_dynamic:
+                    _evm_state = same_index_states.get((evm_state.offset, evm_state.length))
+                    if _evm_state is not None:
                         return _evm_state
 
-                    elif evm_state.type.is_dynamic:
-                        if evm_state.name is None:
-                            evm_state.name = _evm_state.name
-                        if _evm_state.is_public:
-                            evm_state.is_public = _evm_state.is_public
-                        self.evm_states.remove(_evm_state)
-                        break
+                else:
+                    _evm_state = next(iter(same_index_states.values()))
+                    if evm_state.name is None:
+                        evm_state.name = _evm_state.name
+                    if _evm_state.is_public:
+                        evm_state.is_public = _evm_state.is_public
+                    self.delEVMState(_evm_state)
         # print("add new state variables "+str(evm_state))
         self.addEVMState(evm_state)
         return evm_state
 
     def getEVMArg(self, evm_arg:EVMArg):
-        for _evm_arg in self.evm_args:
-            if _evm_arg.index == evm_arg.index:
-                if not evm_arg.is_dynamic:
-                    return _evm_arg
-                else:
-                    _evm_arg.is_dynamic = evm_arg.is_dynamic
-                    return _evm_arg
+        _evm_arg = self.evm_args_by_index.get(evm_arg.index)
+        if _evm_arg is not None:
+            if evm_arg.is_dynamic:
+                _evm_arg.is_dynamic = evm_arg.is_dynamic
+            return _evm_arg
         self.addEVMArg(evm_arg)
         return evm_arg
 
     def getEVMProperty(self, evm_property:EVMProperty):
-        for _evm_property in self.evm_properties:
-            if _evm_property == evm_property:
-                return _evm_property
-
-        return evm_property
+        return self.evm_properties_by_name.get(evm_property.name, evm_property)
 
     def addEVMVariable(self, evm_variable):
         if isinstance(evm_variable, EVMState):
@@ -81,16 +163,26 @@ class EVMVariables:
     def addEVMState(self, evm_state:EVMState):
         if evm_state.offset is None and evm_state.length is None:
             self.evm_storage_dynamic_occupied[evm_state.index] = True
-        self.evm_states.add(evm_state)
+        if evm_state not in self.evm_states:
+            self.evm_states.add(evm_state)
+            self.evm_states_by_index[evm_state.index][(evm_state.offset, evm_state.length)] = evm_state
 
     def delEVMState(self, evm_state:EVMState):
         self.evm_states.remove(evm_state)
+        same_index_states = self.evm_states_by_index[evm_state.index]
+        del same_index_states[(evm_state.offset, evm_state.length)]
+        if not same_index_states:
+            del self.evm_states_by_index[evm_state.index]
 
     def addEVMArg(self, evm_arg:EVMArg):
-        self.evm_args.add(evm_arg)
+        if evm_arg not in self.evm_args:
+            self.evm_args.add(evm_arg)
+            self.evm_args_by_index.setdefault(evm_arg.index, evm_arg)
 
     def addEVMProperty(self, evm_property:EVMProperty):
-        self.evm_properties.add(evm_property)
+        if evm_property not in self.evm_properties:
+            self.evm_properties.add(evm_property)
+            self.evm_properties_by_name.setdefault(evm_property.name, evm_property)
 
     def dump(self) -> Dict:
         return {
@@ -110,8 +202,8 @@ class EVMVariables:
         )    
     
 class EVMVariableAnalyzer(EVMVariables):
-    def __init__(self, evm_states:Set=None, evm_storage_dynamic_occupied:Dict=None, has_analyzed_trees:Dict=None, language:str="Solidity", checker=None) -> None:
-        super().__init__(evm_states, evm_storage_dynamic_occupied, has_analyzed_trees, language=language)
+    def __init__(self, evm_states:Set=None, evm_storage_dynamic_occupied:Dict=None, has_analyzed_trees:Dict=None, language:str="Solidity", checker=None, analyzed_trees_limit:Optional[int]=ANALYZED_TREES_LIMIT) -> None:
+        super().__init__(evm_states, evm_storage_dynamic_occupied, has_analyzed_trees, language=language, analyzed_trees_limit=analyzed_trees_limit)
         # for each path, locations/ref of state variables may be different
         # self.evm_state_ref = defaultdict(dict)
         """state variable lattice"""
@@ -217,8 +309,8 @@ class EVMVariableAnalyzer(EVMVariables):
             if forward_tree.name == "SIGNEXTEND":
                 hints['is_signed'] = True
                 signextend_b = forward_tree.sons[0]
-                if is_numberic(signextend_b.name):
-                    length = numberic(signextend_b.name)+1
+                if signextend_b.value is not None:
+                    length = signextend_b.value+1
                 else:
                     raise OutOfRulesException(f"[forward analysis], SIGNEXTEND bit {str(signextend_b)} is not const")
             
@@ -269,7 +361,7 @@ class EVMVariableAnalyzer(EVMVariables):
                         return 0, SIZE_IN_BYTES, tree
 
         # elif from_sstore and is_numberic(tree.name):
-        elif is_numberic(tree.name):
+        elif tree.value is not None:
             # offset is 0 and length is SIZE_IN_BYTES
             return 0, SIZE_IN_BYTES, tree
 
@@ -344,8 +436,8 @@ class EVMVariableAnalyzer(EVMVariables):
         return evm_state, forward_tree
 
     def calldata_backward(self, root:OpTree, hints):
-        if is_numberic(root.sons[0].name):
-            index = numberic(root.sons[0].name)
+        if root.sons[0].value is not None:
+            index = root.sons[0].value
             # index = numberic(root.sons[0].name) - 0x4
             # if index % 0x20 == 0:
             #     index = index // 0x20
@@ -523,7 +615,7 @@ class EVMVariableAnalyzer(EVMVariables):
                     # for contract 0xc1ec40b714281519ea367eb06429d1701ed18b5f BUYER_STEP_2: S[x] := S[y]
                     evm_state, _ = self.sload_analysis(and_son_backward_sload, from_sstore=True)
                     if evm_state.length and is_numberic(left_value.name) and left_value.name[2:].count("0") == evm_state.length * 2:
-                        Vv = OpTree("0x0")
+                        Vv = OpTree.from_value(0)
                     else:
                         Vv = value_tree
 
@@ -610,8 +702,8 @@ class EVMVariableAnalyzer(EVMVariables):
             return self._handle(root.sons[1], hints, keys)
 
     def _handle_CONST(self, root:OpTree, hints=defaultdict(bool)):
-        if is_numberic(root.name):
-            return numberic(root.name)
+        if root.value is not None:
+            return root.value
         else:
             hints['is_array'] = True
             return 0
@@ -653,9 +745,8 @@ class EVMVariableAnalyzer(EVMVariables):
         queue = [tree]
         while len(queue) > 0:
             current = queue.pop()
-            current_str = str(current)
-            if current_str in self.has_analyzed_trees:
-                _analyzed_evm_variable = self.has_analyzed_trees[current_str]
+            _analyzed_evm_variable = self.has_analyzed_trees.get(current, _MISSING)
+            if _analyzed_evm_variable is not _MISSING:
                 _alias_evm_variable = self.getEVMVariable(_analyzed_evm_variable)
                 if copy_state_variable and isinstance(_alias_evm_variable, EVMState):
                     alias_evm_variable = copy.deepcopy(_alias_evm_variable)
@@ -681,7 +772,7 @@ class EVMVariableAnalyzer(EVMVariables):
             else:
                 if current.name == "SLOAD":
                     alias_evm_variable, forward_tree = self.sload_analysis(current, copy_state_variable=copy_state_variable)
-                    self.has_analyzed_trees[str(forward_tree)] = alias_evm_variable
+                    self.has_analyzed_trees[forward_tree] = alias_evm_variable
 
                     if alias_evm_variable is not None:
                         alias_evm_variable.counts = self.compute_counts(alias_evm_variable, forward_tree)
@@ -692,7 +783,7 @@ class EVMVariableAnalyzer(EVMVariables):
                                         
                 elif "CALLDATALOAD" in current.name:
                     alias_evm_variable = self.calldata_analysis(current)
-                    self.has_analyzed_trees[str(current)] = alias_evm_variable
+                    self.has_analyzed_trees[current] = alias_evm_variable
 
                     if alias_evm_variable is not None:
                         current.alias_evm_variable = alias_evm_variable
@@ -703,7 +794,7 @@ class EVMVariableAnalyzer(EVMVariables):
                     if current.sons[1].name == "CALLDATALOAD":
                         alias_evm_variable = self.calldata_analysis(current.sons[1])
                         # alias_evm_variable.keys = "value"
-                        self.has_analyzed_trees[str(current)] = alias_evm_variable
+                        self.has_analyzed_trees[current] = alias_evm_variable
 
                         if alias_evm_variable is not None:
                             current.alias_evm_variable = alias_evm_variable
@@ -711,7 +802,7 @@ class EVMVariableAnalyzer(EVMVariables):
                             
                     elif current.sons[0].name == "0x0" and current.sons[1].name == "CALLDATASIZE":
                         alias_evm_variable = EVMArg(-1, is_dynamic=True)
-                        self.has_analyzed_trees[str(current)] = alias_evm_variable
+                        self.has_analyzed_trees[current] = alias_evm_variable
 
                         if alias_evm_variable is not None:
                             current.alias_evm_variable = alias_evm_variable
@@ -735,14 +826,14 @@ class EVMVariableAnalyzer(EVMVariables):
 
                         if alias_evm_variable is not None:
                             # alias_evm_variable.keys = "value"
-                            self.has_analyzed_trees[str(current)] = alias_evm_variable
+                            self.has_analyzed_trees[current] = alias_evm_variable
 
                             current.alias_evm_variable = alias_evm_variable
                             evm_args.append(alias_evm_variable)
                             
-                    elif current.sons[0].name.startswith("0x"):
-                        alias_evm_variable = EVMArg(numberic(current.sons[0].name), is_dynamic=False)
-                        self.has_analyzed_trees[str(current)] = alias_evm_variable
+                    elif current.sons[0].value is not None:
+                        alias_evm_variable = EVMArg(current.sons[0].value, is_dynamic=False)
+                        self.has_analyzed_trees[current] = alias_evm_variable
 
                         if alias_evm_variable is not None:
                             current.alias_evm_variable = alias_evm_variable
@@ -750,7 +841,7 @@ class EVMVariableAnalyzer(EVMVariables):
                         
                 elif current.name in BLOCK_TRANSACTION_PROPERTIES or current.name.startswith("0x"): # const
                     evm_property = EVMProperty(current.name)
-                    self.has_analyzed_trees[str(current)] = evm_property
+                    self.has_analyzed_trees[current] = evm_property
                     
                     if evm_property is not None:
                         current.alias_evm_variable = evm_property
@@ -322,6 +322,7 @@ class EVMGraph(basic_cfg.ControlFlowGraph):
         blockLimitExceed = 0
         loopdepthExceed = 0
         executionError = 0
+        constantBranchPruned = 0
 
         while len(queue) > 0:
             # pop the last element
@@ -348,12 +349,23 @@ class EVMGraph(basic_cfg.ControlFlowGraph):
 
             last_op = current.last_op
             dest = None
+            # only the JUMPI successor selected by a constant condition is feasible
+            feasible_succ = None
 
             if last_op.opcode == opcodes.JUMP:
                 dest = stack.peek()
                 dest_block = self.mapping.get(hex(dest), None) if dest is not None else None
                 if dest_block is not None and dest_block.evm_ops[0].opcode == opcodes.JUMPDEST:
                     self.add_edge(current, dest_block)
+            elif last_op.opcode == opcodes.JUMPI and len(stack.stack) > 1 and stack.peek(1) is not None:
+                fallthrough = hex(last_op.pc + 1)
+                if stack.peek(1) == 0:
+                    feasible_succ = lambda suc: suc.ident() == fallthrough
+                elif stack.peek() is not None:
+                    jump_dest = hex(stack.peek())
+                    feasible_succ = lambda suc: suc.ident() == jump_dest
+                else:
+                    feasible_succ = lambda suc: suc.ident() != fallthrough
             
             blockCount += 1
 
@@ -378,6 +390,9 @@ class EVMGraph(basic_cfg.ControlFlowGraph):
             if dfs_depth < loop_depth:
                 if not last_op.opcode == opcodes.JUMP:
                     for suc in current.succs:
+                        if feasible_succ is not None and not feasible_succ(suc):
+                            constantBranchPruned += 1
+                            continue
                         if not suc.last_op.opcode.abnormal_halts():
                             edge = (current.ident(), suc.ident(), stack)
                             if not edge in visited:
@@ -79,13 +79,18 @@ def stack_memory(m_list):
             ret_m.pop()
             ret_m.append(m)
     return ret_m
+def code_word(code:memoryview, offset:int) -> int:
+    """Read the 32-byte word at `offset` of the code, zero-padded past its end like CODECOPY"""
+    chunk = code[offset:offset+SIZE_IN_BYTES]
+    return int.from_bytes(chunk, "big") << (8*(SIZE_IN_BYTES-len(chunk)))
+
 class MemoryException(Exception):
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
 
 class EVMMemory:
 
-    def __init__(self, memory_list=None, memory_mapping=None) -> None:
+    def __init__(self, memory_list=None, memory_mapping=None, code_copies=None) -> None:
         """A light weight Memory implement
         Here, we did not implement MLOAD/MSTORE totally,
         for example, if lenght is variable when comes to CALLDATACOPY
@@ -93,6 +98,9 @@ class EVMMemory:
         For accurately implementation, please ref pape `Precise static modeling of Ethereum memory`"""
         self.memory_list:T.List[DynamicVariable] = memory_list if memory_list is not None else list()
         self.memory_mapping = memory_mapping if memory_mapping is not None else dict()
+        # CODECOPY ranges not yet written into memory_list, as (dst, src, words, code);
+        # the code buffer is shared, words are only decoded when the range is touched
+        self.code_copies:T.List[T.Tuple[int, int, int, memoryview]] = code_copies if code_copies is not None else list()
 
     def mload(self, offset:MemT.Variable, length:MemT.Variable=None) -> T.List:
         if length is None: length = MemT.Variable(value=SIZE_IN_BYTES)
@@ -124,6 +132,9 @@ class EVMMemory:
             if length_const == 0:
                 return []
 
+            if self.code_copies:
+                self.materialize(offset_const, offset_const+length_const)
+
             if len(self.memory_list) < offset_const+length_const:
                 self.memory_list.extend([DynamicVariable.zero_value() for _ in range(offset_const+length_const-len(self.memory_list))])
             mload_values = [deepcopy(self.memory_list[offset_const])]
@@ -186,6 +197,9 @@ class EVMMemory:
         if offset.is_const and length.is_const:
             offset = offset.const_value
             length = length.const_value
+
+            if self.code_copies:
+                self.materialize(offset, offset+length)
             
             if len(self.memory_list) < offset+length:
                 self.memory_list.extend([DynamicVariable.zero_value() for _ in range(offset+length-len(self.memory_list))])
@@ -199,6 +213,42 @@ class EVMMemory:
             else:
                 self.memory_mapping[offset] = {length:value}
 
+    def codecopy(self, offset:int, code:memoryview, code_offset:int, words:int) -> None:
+        """Copy `words` 32-byte words of `code` starting at `code_offset` to memory `offset`.
+
+        Nothing is decoded here: the range is recorded and each word is materialized
+        from the shared code buffer only when an MLOAD/MSTORE touches it."""
+        if words <= 0:
+            return
+        # pending ranges never overlap, older bytes under the new range are settled first
+        self.materialize(offset, offset+words*SIZE_IN_BYTES)
+        self.code_copies.append((offset, code_offset, words, code))
+
+    def materialize(self, start:int, end:int) -> None:
+        """Write the pending CODECOPY words overlapping memory [start, end) into memory_list."""
+        pending = []
+        for dst, src, words, code in self.code_copies:
+            first = max(0, (start-dst)//SIZE_IN_BYTES)
+            last = min(words, (end-dst+SIZE_IN_BYTES-1)//SIZE_IN_BYTES)
+            if first >= last:
+                pending.append((dst, src, words, code))
+                continue
+            if first > 0:
+                pending.append((dst, src, first, code))
+            if last < words:
+                skip = last*SIZE_IN_BYTES
+                pending.append((dst+skip, src+skip, words-last, code))
+            for i in range(first, last):
+                self._store_word(dst+i*SIZE_IN_BYTES, code_word(code, src+i*SIZE_IN_BYTES))
+        self.code_copies = pending
+
+    def _store_word(self, offset:int, value:int) -> None:
+        if len(self.memory_list) < offset+SIZE_IN_BYTES:
+            self.memory_list.extend([DynamicVariable.zero_value() for _ in range(offset+SIZE_IN_BYTES-len(self.memory_list))])
+        value = MemT.Variable(value=value, name="C")
+        for i in range(SIZE_IN_BYTES):
+            self.memory_list[offset+i] = DynamicVariable(value=value, offset=MemT.Variable(value=i, name="C"))
+
     def __str__(self) -> str:
         ret = "Sured:" + "\n"
         cot = len(self.memory_list)
@@ -223,4 +273,4 @@ class EVMMemory:
         )
 
     def __deepcopy__(self, memodict={}):
-        return type(self)(deepcopy(self.memory_list), deepcopy(self.memory_mapping))
\ No newline at end of file
+        return type(self)(deepcopy(self.memory_list), deepcopy(self.memory_mapping), self.code_copies[:])
\ No newline at end of file
@@ -3,6 +3,19 @@ from typing import *
 import disco.common.structures.opcodes as opcodes
 from disco.common.exceptions.StackHandlingExceptions import StackSizeOverflow
 
+UINT256_MASK:int = (1 << 256) - 1
+
+# Cheap constant folding for the ops feeding JUMPI conditions, result is taken modulo 2**256
+FOLDABLE_OPS:Dict[opcodes.OpCode, Callable[..., int]] = {
+    opcodes.ISZERO: lambda a: int(a == 0),
+    opcodes.EQ: lambda a, b: int(a == b),
+    opcodes.LT: lambda a, b: int(a < b),
+    opcodes.GT: lambda a, b: int(a > b),
+    opcodes.OR: lambda a, b: a | b,
+    opcodes.XOR: lambda a, b: a ^ b,
+    opcodes.NOT: lambda a: a ^ UINT256_MASK,
+}
+
 class EVMStack:
     MAX_STACK_SIZE:int = 1024
     STACK_TAIL_SIZE:int = 48
@@ -44,6 +57,9 @@ class EVMStack:
         # AND
         elif evm_op.opcode == opcodes.AND:
             self.executeAnd()
+        # ISZERO, EQ, LT, GT, OR, XOR, NOT
+        elif evm_op.opcode in FOLDABLE_OPS:
+            self.executeFold(evm_op)
         else:
             for i in range(evm_op.opcode.pop):
                 self.stack.pop()
@@ -86,4 +102,12 @@ class EVMStack:
             self.stack.append(a & b)
         else:
             self.stack.append(None)
-        self.valid_stack()
\ No newline at end of file
+        self.valid_stack()
+
+    def executeFold(self, evm_op):
+        args = [self.stack.pop() for _ in range(evm_op.opcode.pop)]
+        if all(arg is not None for arg in args):
+            self.stack.append(FOLDABLE_OPS[evm_op.opcode](*args) & UINT256_MASK)
+        else:
+            self.stack.append(None)
+        self.valid_stack()
@@ -211,6 +211,12 @@ class EVMType:
     def dump(self) -> Dict:
         return {"type_name":str(self)}
     
+    def copy(self):
+        """Same as a dump/load round-trip, only the type name is kept"""
+        _type = EVMType(type_name=str(self))
+        _type.type_inference()
+        return _type
+    
     @staticmethod
     def empty_instance():
         return EVMType()
@@ -312,10 +312,24 @@ class EVMState(EVMVariable):
         }
     
     def copy(self):
-        return self.load(self.dump())
+        """Clone of the path-sensitive fields (counts, keys list, counts_mapping), the key trees are shared"""
+        return EVMState(
+            index=self.index,
+            offset=self.offset,
+            length=self.length,
+            type=self.type.copy(),
+            is_public=self.is_public,
+            signature=self.signature,
+            name=self.name,
+            counts=self.counts,
+            counts_mapping=self.counts_mapping,
+            inferred_name=self.inferred_name,
+            keys=list(self.keys),
+            from_load=True
+        )
     
     def __deepcopy__(self, memodict={}):
-        return self.load(self.dump())
+        return self.copy()
     
     @classmethod
     def load(cls, data):
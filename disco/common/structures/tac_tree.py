@@ -1,14 +1,19 @@
 """gas:https://ethereum.stackexchange.com/questions/70208/gas-is-0-when-executing-call-opcode"""
-import json
+import copy
+import logging
 import os
 import re
 import string
 from inspect import istraceback
+from collections import abc, deque
 from typing import *
 
 import disco.common.structures.base.memtypes as MemT
 import disco.common.structures.opcodes as opcodes
-from disco.common.utils.lifting_utils import SHA3_MAPPING_PATH
+from disco.common.utils.lifting_utils import SHA3_MAPPING_PATH, SHA3_TABLE_PATH
+from disco.common.utils.sha3_table import SHA3Table
+
+logger = logging.getLogger(__name__)
 
 SYMBOL_MAPPING = {
     "ISZERO":"(0 == {})",
@@ -67,67 +72,212 @@ CHECK_ON_SELFDESTRUCT = ["SELFDESTRUCT"]
 
 CHECK_ON_CALLRETURNS = [f"{CALL}RETURN" for CALL in CHECK_ON_CALLS]
 
+CSTATE_BITS = {
+    'check_on_sload':1 << 0,
+    'check_on_caller':1 << 1,
+    'check_on_callvalue':1 << 2,
+    'check_on_extcodesize':1 << 3,
+    'check_on_calldatasize':1 << 4,
+
+    'check_on_calls':1 << 5,
+    'check_on_creates':1 << 6,
+    'check_on_selfdestruct':1 << 7,
+
+    'check_on_callreturn':1 << 8,
+}
+
+_CSTATE_MASKS:Dict[str, int] = dict()
+for _names, _flag in (
+    (CHECK_ON_SLOAD, 'check_on_sload'),
+    (CHECK_ON_CALLER, 'check_on_caller'),
+    (CHECK_ON_CALLVALUE, 'check_on_callvalue'),
+    (CHECK_ON_EXTCODESIZE, 'check_on_extcodesize'),
+    (CHECK_ON_CALLDATASIZE, 'check_on_calldatasize'),
+    (CHECK_ON_CALLS, 'check_on_calls'),
+    (CHECK_ON_CREATES, 'check_on_creates'),
+    (CHECK_ON_SELFDESTRUCT, 'check_on_selfdestruct'),
+):
+    for _name in _names:
+        _CSTATE_MASKS[_name] = _CSTATE_MASKS.get(_name, 0) | CSTATE_BITS[_flag]
+
+def cstates_mask(name:str) -> int:
+    """Condition-state flags raised by a node named `name`"""
+    mask = _CSTATE_MASKS.get(name)
+    if mask is None:
+        # callreturns are matched by substring, e.g. CALLRETURN_0x1f
+        mask = CSTATE_BITS['check_on_callreturn'] if any(c in name for c in CHECK_ON_CALLRETURNS) else 0
+        _CSTATE_MASKS[name] = mask
+    return mask
+
+class CStates(abc.Mapping):
+    """Read-only dict view over the condition-state bitmask of an `OpTree`"""
+    __slots__ = ('mask',)
+
+    def __init__(self, mask:int) -> None:
+        self.mask = mask
+
+    def __getitem__(self, cstate:str) -> bool:
+        return bool(self.mask & CSTATE_BITS[cstate])
+
+    def __iter__(self):
+        return iter(CSTATE_BITS)
+
+    def __len__(self) -> int:
+        return len(CSTATE_BITS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
 # BACKGROUND_OPCODE = ('TIMESTAMP','BLOCK','CALLVALUE')
 
-if os.path.exists(SHA3_MAPPING_PATH):
-    with open(SHA3_MAPPING_PATH,"r") as f:
-        OPTIMIZED_CONSTANT = json.load(f)
-else:
-    OPTIMIZED_CONSTANT = dict()
+OPTIMIZED_CONSTANT = SHA3Table(SHA3_TABLE_PATH)
+"""Preimages of SHA3 constants, the table is mapped on the first lookup"""
+if not os.path.exists(SHA3_TABLE_PATH) and os.path.exists(SHA3_MAPPING_PATH):
+    logger.warning(f"{SHA3_MAPPING_PATH} is not read anymore and {SHA3_TABLE_PATH} is missing, the SHA3 constants are not recovered: "
+                   f"run `python disco build_sha3_table --from-json {SHA3_MAPPING_PATH}`")
+
+def _rendered_sons_of(name:str, sons:List) -> List:
+    """Sons whose renderings are part of the rendering of a node named `name`, neither a constant nor an alias"""
+    if name == "ISZERO":
+        son = sons[0]
+        return son.sons if son.name in SYMBOL_MAPPING_REV else [son]
+    elif name in SYMBOL_MAPPING:
+        return sons[:2]
+    else:
+        return sons
+
+def _format_node(name:str, sons:List, strs:List[str]) -> str:
+    """Rendering of a node named `name` on top of the renderings of `_rendered_sons_of`"""
+    if name == "ISZERO":
+        son = sons[0]
+        format_ = SYMBOL_MAPPING_REV[son.name] if son.name in SYMBOL_MAPPING_REV else SYMBOL_MAPPING[name]
+        return format_.format(*strs)
+    elif name in SYMBOL_MAPPING:
+        return SYMBOL_MAPPING[name].format(*strs)
+    elif len(sons) > 0:
+        return "{}({})".format(name, ",".join(strs))
+    else:
+        return name
+
+def fold_tree(root, children:Callable, combine:Callable):
+    """
+        Post-order fold of a tree with an explicit stack, deep trees do not hit the recursion limit
+        @param `children` node -> the list of sons to visit, an empty list stops the descent
+        @param `combine` (node, sons, values of the sons) -> value of the node
+    """
+    # pre-order with the last son first, its reverse is the post-order
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        sons = children(node)
+        order.append((node, sons))
+        stack.extend(sons)
+
+    values = []
+    for node, sons in reversed(order):
+        if sons:
+            sons_values = values[-len(sons):]
+            del values[-len(sons):]
+        else:
+            sons_values = []
+        values.append(combine(node, sons, sons_values))
+    return values[0]
+
+class TreeKey:
+    """
+        Structural key of an OpTree: the name of the root, its value, the details of its alias (with counts and keys) and the keys of its sons.
+        The sons of a constant or of an alias are not part of the key, as in the rendering.
+        The hash is built from the hashes of the sons, and the keys are compared exactly.
+    """
+    __slots__ = ('name', 'value', 'alias', 'sons', '_hash')
+
+    def __init__(self, name:Optional[str], value:Optional[int], alias:Optional[str], sons:Tuple) -> None:
+        self.name = name
+        self.value = value
+        self.alias = alias
+        self.sons = sons
+        self._hash = hash((name, value, alias, sons))
+
+    @classmethod
+    def of(cls, node:"OpTree", sons_keys:Sequence["TreeKey"]=()) -> "TreeKey":
+        """Key of `node` on top of the keys of its sons"""
+        if node.alias_evm_variable is not None:
+            return cls(node._name, node.value, node.alias_evm_variable.details(True, True), ())
+        elif node.value is not None:
+            return cls(None, node.value, None, ())
+        return cls(node._name, None, None, tuple(sons_keys))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, __o: object) -> bool:
+        # without recursion, the keys may be as deep as the trees
+        stack = [(self, __o)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            if type(b) is not TreeKey or a._hash != b._hash or a.name != b.name or a.value != b.value or a.alias != b.alias or len(a.sons) != len(b.sons):
+                return False
+            stack.extend(zip(a.sons, b.sons))
+        return True
+
+    def render(self) -> str:
+        """The rendering of the trees of this key, see `OpTree.details`"""
+        def children(key:TreeKey) -> List:
+            return [] if key.alias is not None or key.value is not None else _rendered_sons_of(key.name, key.sons)
+
+        def combine(key:TreeKey, sons, strs:List[str]) -> str:
+            if key.alias is not None:
+                return key.alias
+            elif key.value is not None:
+                return hex(key.value)
+            return _format_node(key.name, key.sons, strs)
+        return fold_tree(self, children, combine)
 
 class OpTree:
-    def __init__(self, name:str, sons=None, reference_blocks=None, is_zero:bool=False, with_optimized:bool=False) -> None:
+    def __init__(self, name:str, sons=None, reference_blocks=None, is_zero:bool=False, with_optimized:bool=False, value:int=None) -> None:
+        self._key:TreeKey = None
+        """Structural key, only kept by the nodes of the memoized trees (see `_freeze`), which are never edited"""
+
+        if value is None and name.startswith("0x"):
+            value = int(name, 16)
+        self.value = value
+        """Value of a constant node, None for the others"""
+
         # some constant are optimized (e.g., SHA3)
         self.with_optimized = with_optimized
-        if name in OPTIMIZED_CONSTANT:
+        preimage = OPTIMIZED_CONSTANT.get(value) if value is not None else None
+        if preimage is not None:
             self.with_optimized = True
-            self.name = "SHA3"
-            sons = [OpTree(hex(OPTIMIZED_CONSTANT[name]['key'])), OpTree(hex(OPTIMIZED_CONSTANT[name]['index']))]
+            self._name = "SHA3"
+            self.value = None
+            sons = [OpTree.from_value(word) for word in preimage]
         else:
-            self.name = name
-            """Name of the root"""
+            self._name = name
+            """Name of the root, rendered from the value for constants built by `from_value`"""
         
         if sons is None:
             sons = []
         elif isinstance(sons, OpTree):
             sons = [sons]
+        self._origin:OpTree = None
+        """The tree this node is a lazy copy of, its sons are copied on the first access (see `lazy_copy`)"""
         self.sons = sons
-        """Sons of the root"""
 
         self.father:OpTree = None
         """Father of the root"""
         self.son_idx:int = -1
         
-        self.cstates = {
-            'check_on_sload':True if name in CHECK_ON_SLOAD else False,
-            'check_on_caller':True if name in CHECK_ON_CALLER else False,
-            'check_on_callvalue':True if name in CHECK_ON_CALLVALUE else False,
-            'check_on_extcodesize':True if name in CHECK_ON_EXTCODESIZE else False,
-            'check_on_calldatasize':True if name in CHECK_ON_CALLDATASIZE else False,
-
-            'check_on_calls':True if name in CHECK_ON_CALLS else False,
-            'check_on_creates':True if name in CHECK_ON_CREATES else False,
-            'check_on_selfdestruct':True if name in CHECK_ON_SELFDESTRUCT else False,
-            
-            'check_on_callreturn':True if any(c in name for c in CHECK_ON_CALLRETURNS) else False,
-        }
-        
+        self._cstates = cstates_mask(self._name) if self.value is None else 0
+        """Condition-state flags, see `CSTATE_BITS`"""
+
         for son_idx, son in enumerate(sons):
             son.father = self
             son.son_idx = son_idx
             self.with_optimized |= son.with_optimized
-            
-            self.cstates['check_on_sload'] |= son.cstates['check_on_sload']
-            self.cstates['check_on_caller'] |= son.cstates['check_on_caller']
-            self.cstates['check_on_callvalue'] |= son.cstates['check_on_callvalue']
-            self.cstates['check_on_extcodesize'] |= son.cstates['check_on_extcodesize']
-            self.cstates['check_on_calldatasize'] |= son.cstates['check_on_calldatasize']
-            
-            self.cstates['check_on_calls'] |= son.cstates['check_on_calls']
-            self.cstates['check_on_creates'] |= son.cstates['check_on_creates']
-            self.cstates['check_on_selfdestruct'] |= son.cstates['check_on_selfdestruct']
-            
-            self.cstates['check_on_callreturn'] |= son.cstates['check_on_callreturn']
+            self._cstates |= son._cstates
             
         self.contained_evm_states = []
         """The related EVM States of this tree"""
@@ -151,21 +301,73 @@ class OpTree:
         for son in sons:
             self.reference_blocks |= son.reference_blocks  
             
+    @property
+    def sons(self) -> List:
+        """Sons of the root"""
+        if self._sons is None:
+            sons = [son.lazy_copy() for son in self._origin.sons]
+            for son_idx, son in enumerate(sons):
+                son.father = self
+                son.son_idx = son_idx
+            self._sons = sons
+        return self._sons
+
+    @sons.setter
+    def sons(self, sons:List):
+        self._sons = sons
+
+    @property
+    def cstates(self) -> CStates:
+        return CStates(self._cstates)
+
+    @property
+    def name(self) -> str:
+        if self._name is None:
+            self._name = hex(self.value)
+        return self._name
+
+    @name.setter
+    def name(self, name:str):
+        # a renamed copy is no longer rendered as the node it copies
+        self.sons
+        self._name = name
+        self.value = int(name, 16) if name.startswith("0x") else None
+
     def from_tree(self, tree):
         """Tree edit, keep the object id"""
         tree.father = self.father
         for k,v in vars(tree).items():
             setattr(self, k, v)
 
+    def lazy_copy(self):
+        """
+            Copy of this node, without going through the constructor.
+            The sons are copied the first time they are accessed, so a copy costs the part of the tree that is visited.
+            The copied tree must not be edited afterwards.
+        """
+        node = OpTree.__new__(OpTree)
+        attrs = self.__dict__.copy()
+        attrs['_sons'] = None
+        attrs['_origin'] = self if self._sons is not None else self._origin
+        attrs['_key'] = None
+        attrs['father'] = None
+        attrs['son_idx'] = -1
+        attrs['contained_evm_states'] = []
+        attrs['contained_evm_args'] = []
+        attrs['contained_evm_properties'] = []
+        attrs['_smt'] = None
+        node.__dict__ = attrs
+        return node
+
     def get_background(self)->List[Optional[str]]:
         """
             return nodes related to "background", e.g. callvalue, timestamp
         """
-        queue:List[OpTree] = [self]
+        queue:Deque[OpTree] = deque([self])
         ret = []
         while len(queue):
-            head = queue.pop(0)
-            if not head.name.startswith('0x'): 
+            head = queue.popleft()
+            if head.value is None: 
                 _op = opcodes.opcode_by_name(head.name)
                 if _op.pop == 0 and _op.push == 1:
                     ret.append(head.name)
@@ -180,40 +382,63 @@ class OpTree:
         return root
 
     def _is_numeric(self):
-        if not self.name.startswith("0x"):
+        if self.value is None:
             return False, -1
         else:
-            return True, int(self.name, base=16)
+            return True, self.value
+
+    def _rendered_sons(self) -> List:
+        """Sons whose renderings are part of the rendering of the node"""
+        if self.alias_evm_variable is not None or self.value is not None:
+            return []
+        elif self._sons is None:
+            # a node whose sons are not copied yet is rendered as the node it copies
+            return [self._origin]
+        return _rendered_sons_of(self.name, self.sons)
+
+    def _render(self, rendered:List, strs:List[str], with_counts:bool=True, with_keys:bool=True) -> str:
+        """Rendering of the node on top of the renderings of `_rendered_sons`"""
+        if self.alias_evm_variable is not None:
+            return self.alias_evm_variable.details(with_counts, with_keys)
+        elif self.value is not None:
+            return self.name
+        elif self._sons is None:
+            return strs[0]
+        return _format_node(self.name, self.sons, strs)
 
     # why default is False?
     # change to True
     def details(self, with_counts:bool=True, with_keys:bool=True):
         if self.alias_evm_variable is not None:
             return self.alias_evm_variable.details(with_counts, with_keys)
-        else:
-            if self.name.startswith("0x"):
-                return self.name
-
-            elif self.name == "ISZERO":
-                son = self.sons[0]
-                if son.name in SYMBOL_MAPPING_REV:
-                    format_ = SYMBOL_MAPPING_REV.get(son.name)
-                    return format_.format(*tuple(str(s) for s in son.sons))
-                else:
-                    format_ = SYMBOL_MAPPING.get(self.name, None)
-                    return format_.format(str(son))
-            else:
-                format_ = SYMBOL_MAPPING.get(self.name, None)
-                if format_:
-                    return format_.format(str(self.sons[0]),str(self.sons[1]))
-                elif len(self.sons) > 0:
-                    return "{}({})".format(self.name, ",".join(str(son) for son in self.sons))
-                else:
-                    return self.name
+        # the sons are rendered with the default arguments
+        return fold_tree(self, OpTree._rendered_sons, OpTree._render)
     
     def __str__(self) -> str:
         return self.details()
-            
+
+    def shallow_key(self) -> Optional[TreeKey]:
+        """The structural key if it is known without visiting the sons, None otherwise"""
+        if self.alias_evm_variable is not None or self.value is not None:
+            return TreeKey.of(self)
+        elif self._key is not None:
+            return self._key
+        elif self._sons is None:
+            # a node whose sons are not copied yet has the key of the node it copies
+            return self._origin.shallow_key()
+        return None
+
+    def _keyed_sons(self) -> List:
+        return [] if self.shallow_key() is not None else self.sons
+
+    def _key_from_sons(self, sons:List, sons_keys:List[TreeKey]) -> TreeKey:
+        key = self.shallow_key()
+        return key if key is not None else TreeKey.of(self, sons_keys)
+
+    def key(self) -> TreeKey:
+        """Structural key of the tree, equal keys for the equal trees (unlike the renderings, e.g. GT and SGT are told apart)"""
+        return fold_tree(self, OpTree._keyed_sons, OpTree._key_from_sons)
+
     def __hash__(self) -> int:
         return hash(str(self))
 
@@ -222,11 +447,9 @@ class OpTree:
 
     def __lt__(self, __o: object) -> bool:
         if type(self) == type(__o):
-            if self.name.startswith("0x") and __o.name.startswith("0x"):
-                self_value = int(self.name, 16)
-                o_value = int(__o.name, 16)
-                return self_value < o_value
-            elif self.name.startswith("0x") and not __o.name.startswith("0x"):
+            if self.value is not None and __o.value is not None:
+                return self.value < __o.value
+            elif self.value is not None and __o.value is None:
                 return True
         return False
 
@@ -241,6 +464,11 @@ class OpTree:
     def from_const(cls, const_value:str):
         return cls(const_value)
 
+    @classmethod
+    def from_value(cls, value:int):
+        """Constant node, its hex name is only rendered when asked for"""
+        return cls(None, value=value)
+
     def get_son(self, NAME:str=None, NUM:bool=False, anti:bool=False):
         """Get the specific son by son's name.
         Args:
@@ -251,10 +479,10 @@ class OpTree:
             if not anti:
                 if NAME and son.name == NAME:
                     return son
-                if NUM and son.name.startswith("0x"):
+                if NUM and son.value is not None:
                     return son
             else:
-                if NUM and not son.name.startswith("0x"):
+                if NUM and son.value is None:
                     return son
                 if NAME and son.name != NAME:
                     return son
@@ -319,16 +547,62 @@ class OpTree:
         else:
             return G
 
-def tree_from_variable(variable:MemT.Variable, need_opposite:bool=False) -> OpTree:
+def tree_from_variable(variable:MemT.Variable, need_opposite:bool=False, memo:Dict=None) -> OpTree:
     """Return an operation tree from the variable according its usage information.
     
     Arguments:
         variable: MemT.Variable, tac variable, it can be a const.
         need_opposite: bool, true iff opposite and add a ISZERO node.
+        memo: dict, subtrees already built on the same path, shared by the calls of one path.
 
     Returns:
         optree: OpTree, tree structure of the variable usage.
     """
+    if memo is None:
+        memo = dict()
+    optree = _tree_from_variable(variable, need_opposite, memo)
+    father = memo[(id(variable), need_opposite)][2]
+    if father is not None:
+        # the son of an ISZERO is returned as the opposite, it keeps its father
+        return unshared_tree(father).sons[0]
+    return unshared_tree(optree)
+
+def unshared_tree(tree:OpTree) -> OpTree:
+    """
+        Copy a tree built by `_tree_from_variable`, every occurrence of a shared node gets its own copy.
+        The nodes are copied when they are first visited, the parts of the tree that are never visited are not copied.
+    """
+    return tree.lazy_copy()
+
+def _freeze(tree:OpTree):
+    """Key the nodes of a memoized tree, the memoized trees are only read through their copies"""
+    def combine(node:OpTree, sons, sons_keys):
+        if node._key is None:
+            node._key = TreeKey.of(node, sons_keys)
+        return node._key
+    fold_tree(tree, lambda node: [] if node._key is not None else node.sons, combine)
+
+def _detached(tree:OpTree) -> OpTree:
+    """Shallow copy of a memoized node, so that its loc/is_zero can be changed"""
+    return copy.copy(tree)
+
+def _tree_from_variable(variable:MemT.Variable, need_opposite:bool, memo:Dict) -> OpTree:
+    """Build the tree as a DAG, the returned nodes may be shared and must not be edited"""
+    key = (id(variable), need_opposite)
+    if key not in memo:
+        optree = _build_tree_from_variable(variable, need_opposite, memo)
+        father = None
+        if isinstance(optree, tuple):
+            father, optree = optree
+        _freeze(optree)
+        if father is not None:
+            _freeze(father)
+        # keep the variable alive, so that its id is not reused
+        memo[key] = (variable, optree, father)
+    return memo[key][1]
+
+def _build_tree_from_variable(variable:MemT.Variable, need_opposite:bool, memo:Dict) -> Union[OpTree, Tuple[OpTree, OpTree]]:
+    """The opposite of an ISZERO tree is returned together with the ISZERO node"""
     # variable folding
     while isinstance(variable, MemT.Variable) and isinstance(variable.value, MemT.Variable) and variable.value is not None:
         variable = variable.value
@@ -338,12 +612,12 @@ def tree_from_variable(variable:MemT.Variable, need_opposite:bool=False) -> OpTr
 
     if isinstance(variable,int):
         if not need_opposite:
-            optree = OpTree(hex(variable))
+            optree = OpTree.from_value(variable)
             if variable == 0:
                 optree.is_zero = True
             return optree
         else:
-            optree = OpTree("ISZERO",OpTree(hex(variable)))
+            optree = OpTree("ISZERO",OpTree.from_value(variable))
             if variable != 0:
                 optree.is_zero = True
             return optree
@@ -351,12 +625,12 @@ def tree_from_variable(variable:MemT.Variable, need_opposite:bool=False) -> OpTr
     if not isinstance(variable, MemT.Variable):
         # DynamicVariable
         if variable.is_const:
-            optree = OpTree(hex(variable.const_value))
+            optree = OpTree.from_value(variable.const_value)
         else:
             if variable.offset.is_const and variable.length.is_const:
-                optree = tree_from_variable(variable.value)
+                optree = _tree_from_variable(variable.value, False, memo)
             else:
-                sons = [tree_from_variable(variable.offset), tree_from_variable(variable.length)]
+                sons = [_tree_from_variable(variable.offset, False, memo), _tree_from_variable(variable.length, False, memo)]
                 optree = OpTree(variable.value.name, sons=sons)
     else:
         def_sites = list(variable.def_sites)[0]
@@ -369,17 +643,17 @@ def tree_from_variable(variable:MemT.Variable, need_opposite:bool=False) -> OpTr
         references_blocks.add(def_sites.block)
 
         if opcodeNode == "CONST":
-            optree = OpTree(hex(inst.lhs.const_value))
+            optree = OpTree.from_value(inst.lhs.const_value)
             if inst.lhs.const_value == 0:
                 optree.is_zero = True
         elif opcodeNode == "MLOAD":
             if isinstance(inst.lhs.value, MemT.Variable):
-                optree = tree_from_variable(inst.lhs.value)
+                optree = _tree_from_variable(inst.lhs.value, False, memo)
             else:
                 value = inst.lhs.value
                 while hasattr(value, "value") and not isinstance(value.value, MemT.Variable):
                     value = value.value
-                sons = [tree_from_variable(value.offset), tree_from_variable(value.length)]
+                sons = [_tree_from_variable(value.offset, False, memo), _tree_from_variable(value.length, False, memo)]
                 optree = OpTree(value.name, sons=sons, reference_blocks=references_blocks)
                 optree.loc = loc
             # optree.transaction_index = inst.transaction_index
@@ -396,37 +670,37 @@ def tree_from_variable(variable:MemT.Variable, need_opposite:bool=False) -> OpTr
                     if not isinstance(arg, str): # for transactions, the args are real values
                         arg_value = arg.value
                         if arg_value.is_const:
-                            const_tree = OpTree(hex(arg_value.const_value))
+                            const_tree = OpTree.from_value(arg_value.const_value)
                             const_tree.is_zero = arg_value.const_value == 0
                             sons.append(const_tree)
                         else:
-                            son = tree_from_variable(arg_value)
+                            son = _tree_from_variable(arg_value, False, memo)
                             sons.append(son)
                     else:
                         if len(arg) > 0:
                             const_tree = OpTree("0x" + arg)
-                            const_tree.is_zero = int("0x" + arg, 16) == 0
+                            const_tree.is_zero = const_tree.value == 0
                             sons.append(const_tree)
             else:
                 for arg in inst.args:
                     arg_value = arg.value
                     if arg_value.is_const:
-                        const_tree = OpTree(hex(arg_value.const_value))
+                        const_tree = OpTree.from_value(arg_value.const_value)
                         const_tree.is_zero = arg_value.const_value == 0
                         sons.append(const_tree)
                     elif arg_value.def_sites is not None:
-                        son = tree_from_variable(arg_value)
+                        son = _tree_from_variable(arg_value, False, memo)
                         sons.append(son)
                     else:
                         raise NotImplementedError("The arg value is not const and def_site is empty")
             # constant propagation
             if (opcodeNode == "DIV" and sons[0].is_zero) or (opcodeNode == "MUL" and (sons[0].is_zero or sons[1].is_zero)):
-                optree = OpTree(hex(0))
+                optree = OpTree.from_value(0)
                 optree.is_zero = True
             elif opcodeNode == "ADD" and sons[0].is_zero:
-                optree = sons[1]
+                optree = _detached(sons[1])
             elif (opcodeNode == "ADD" and sons[1].is_zero) or (opcodeNode == "SUB" and sons[1].is_zero):
-                optree = sons[0]
+                optree = _detached(sons[0])
             else:
                 optree = OpTree(opcodeNode, sons, references_blocks)
             # optree.transaction_index = inst.transaction_index
@@ -436,11 +710,12 @@ def tree_from_variable(variable:MemT.Variable, need_opposite:bool=False) -> OpTr
 
     if not need_opposite:
         if optree.is_zero:
+            optree = _detached(optree)
             optree.is_zero = False 
         return optree
     else:
         if optree.name == "ISZERO":
-            return optree.sons[0]
+            return optree, optree.sons[0]
         else:
             optree = OpTree("ISZERO", optree)
             optree.loc = loc
@@ -457,42 +732,46 @@ def expanded_condition_tree(_tree:OpTree):
     else:
         return _tree
 
+def _is_cast_mask(tree:OpTree) -> bool:
+    """Whether the tree is a constant of the form 0x0..0f..f"""
+    value = tree.value
+    return value is not None and value > 0 and value & (value + 1) == 0 and value.bit_length() % 4 == 0
+
 def tree_cast_removal(tree:OpTree, evm_analyzer=None) -> OpTree:
-    if tree.alias_evm_variable is not None:
-        return tree
-    
-    # bool cast
-    if tree.name == "ISZERO" and tree.sons[0].name == "ISZERO":
-        v = tree.sons[0].sons[0]
-        if evm_analyzer is not None and v.alias_evm_variable is not None:
-            alias_evm_variable = evm_analyzer.getEVMVariable(v.alias_evm_variable)
-            # to make sure the alias evm variable is evm state
-            if alias_evm_variable.index > -1 and isinstance(alias_evm_variable.keys, list) and alias_evm_variable.type.is_elementary and alias_evm_variable.length == 1:
-                alias_evm_variable.change_to_bool_type()
-        return tree_cast_removal(v, evm_analyzer)
-
-    # uint/bytes cast
-    elif tree.name == "AND":
-        left, right = map(lambda x:x.name[2:] if x.name.startswith("0x") else x.name, tree.sons)
-        if re.match("^(0)*(f)+$", left):
-            return tree_cast_removal(tree.sons[1], evm_analyzer)
-        elif re.match("^(0)*(f)+$", right):
-            return tree_cast_removal(tree.sons[0], evm_analyzer)   
-
-    # int cast
-    elif tree.name == "SIGNEXTEND":
-        return tree_cast_removal(tree.sons[1], evm_analyzer)
-
-    # type fix
-    # 0xd1613bfb12c53bff3fb19f6a8bc69c4a3a6cdf2d
-    elif tree.name in ["ADD","MUL","SUB","DIV","SDIV","MOD","SMODE","EXP"]:
-        for son in tree.sons:
-            if evm_analyzer is not None and son.alias_evm_variable is not None:
-                alias_evm_variable=evm_analyzer.getEVMVariable(son.alias_evm_variable)
-                son.alias_evm_variable.change_to_computable_type()
-                alias_evm_variable.change_to_computable_type()
-    
-    elif tree.name in ["SHR", "SAR"] and tree.sons[0].name == "0x0":
-        return tree_cast_removal(tree.sons[1], evm_analyzer)
+    # a cast is removed by moving down to the casted son, until no cast is left
+    while tree.alias_evm_variable is None:
+        # bool cast
+        if tree.name == "ISZERO" and tree.sons[0].name == "ISZERO":
+            v = tree.sons[0].sons[0]
+            if evm_analyzer is not None and v.alias_evm_variable is not None:
+                alias_evm_variable = evm_analyzer.getEVMVariable(v.alias_evm_variable)
+                # to make sure the alias evm variable is evm state
+                if alias_evm_variable.index > -1 and isinstance(alias_evm_variable.keys, list) and alias_evm_variable.type.is_elementary and alias_evm_variable.length == 1:
+                    alias_evm_variable.change_to_bool_type()
+            tree = v
+
+        # uint/bytes cast
+        elif tree.name == "AND" and _is_cast_mask(tree.sons[0]):
+            tree = tree.sons[1]
+        elif tree.name == "AND" and _is_cast_mask(tree.sons[1]):
+            tree = tree.sons[0]
+
+        # int cast
+        elif tree.name == "SIGNEXTEND":
+            tree = tree.sons[1]
+
+        elif tree.name in ["SHR", "SAR"] and tree.sons[0].value == 0:
+            tree = tree.sons[1]
+
+        else:
+            # type fix
+            # 0xd1613bfb12c53bff3fb19f6a8bc69c4a3a6cdf2d
+            if tree.name in ["ADD","MUL","SUB","DIV","SDIV","MOD","SMODE","EXP"]:
+                for son in tree.sons:
+                    if evm_analyzer is not None and son.alias_evm_variable is not None:
+                        alias_evm_variable=evm_analyzer.getEVMVariable(son.alias_evm_variable)
+                        son.alias_evm_variable.change_to_computable_type()
+                        alias_evm_variable.change_to_computable_type()
+            break
     
     return tree
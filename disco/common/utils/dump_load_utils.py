@@ -1,12 +1,7 @@
 from disco.common.structures.evm_variable import EVMArg, EVMProperty, EVMState
-from disco.common.structures.tac_tree import OpTree
+from disco.common.structures.tac_tree import OpTree, fold_tree
 
-def serialize_tree(optree:OpTree):
-    if optree is None:
-        return None
-
-    serialize_sons = [serialize_tree(son) for son in optree.sons]
-    
+def _serialize_node(optree:OpTree, sons, serialize_sons):
     return {
         "name": optree.name,
         "alias_evm_variable": optree.alias_evm_variable.dump() if optree.alias_evm_variable is not None else None,
@@ -14,9 +9,13 @@ def serialize_tree(optree:OpTree):
         "sons": serialize_sons
     }
 
-def deserialize_tree(data):
-    if data is None:
+def serialize_tree(optree:OpTree):
+    if optree is None:
         return None
+
+    return fold_tree(optree, lambda node: node.sons, _serialize_node)
+
+def _deserialize_node(data, sons_data, sons):
     __alias_evm_variable_type = data['alias_evm_variable']
     if __alias_evm_variable_type is None:
         alias_evm_variable = None
@@ -31,8 +30,13 @@ def deserialize_tree(data):
     
     contained_evm_states = [EVMState.load(evm_state) for evm_state in data['contained_evm_states']]
     
-    sons = [deserialize_tree(son) for son in data['sons']]
     tree = OpTree(data['name'], sons)
     tree.alias_evm_variable = alias_evm_variable
     tree.contained_evm_states = contained_evm_states
-    return tree
\ No newline at end of file
+    return tree
+
+def deserialize_tree(data):
+    if data is None:
+        return None
+
+    return fold_tree(data, lambda node: node['sons'], _deserialize_node)
\ No newline at end of file
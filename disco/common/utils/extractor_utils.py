@@ -24,16 +24,16 @@ def is_update_length(semantic_unit):
 
 def sat_tree(optree):
     # return True
-    if len(optree.sons) == 0:
-        return True
-    elif len(optree.sons) == 2:
-        name = optree.name
-        if name in ['GT','LT','EQ'] and any(tree.alias_evm_variable is not None and hasattr(tree.alias_evm_variable, 'is_dynamic') and tree.alias_evm_variable.is_dynamic for tree in optree.sons):
-            return False
-        else:
-            return all(sat_tree(s) for s in optree.sons)
-    else:
-        return all(sat_tree(s) for s in optree.sons)
+    # false iff some comparison is on a dynamic variable, visited with an explicit stack
+    stack = [optree]
+    while stack:
+        tree = stack.pop()
+        if len(tree.sons) == 2:
+            name = tree.name
+            if name in ['GT','LT','EQ'] and any(son.alias_evm_variable is not None and hasattr(son.alias_evm_variable, 'is_dynamic') and son.alias_evm_variable.is_dynamic for son in tree.sons):
+                return False
+        stack.extend(tree.sons)
+    return True
 
 def pruning_unnecessary_conditions(semantic_unit:SemanticUnit):
     new_cond = []
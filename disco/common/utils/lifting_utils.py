@@ -1,6 +1,7 @@
 import math
 
 SHA3_MAPPING_PATH = "./sha3_mappings.json"   
+SHA3_TABLE_PATH = "./sha3_mappings.bin"
 
 STATE_AFFECTED_INSTRUCTIONS = {
     "55":"SSTORE",
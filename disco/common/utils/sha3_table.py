@@ -0,0 +1,130 @@
+"""Memory-mapped table of keccak256 preimages, used to recover the SHA3 of optimized constants
+
+File layout (all integers are big-endian):
+    - header: `MAGIC`, the record count (8 bytes)
+    - bucket offsets: 257 record indexes (8 bytes each), bucket `b` holds the digests starting with byte `b`
+    - records sorted by digest: digest (32 bytes), arity (1 byte), two preimage words (32 bytes each)
+"""
+import json
+import mmap
+import os
+import struct
+from typing import *
+
+MAGIC = b"DISCOSHA3\x00\x01\x00"
+HEADER = struct.Struct(">%dsQ" % len(MAGIC))
+BUCKETS = struct.Struct(">257Q")
+WORD_SIZE = 32
+RECORD_SIZE = WORD_SIZE + 1 + 2 * WORD_SIZE
+
+MIN_DIGEST_BITS = 192
+"""Constants below 2**192 are not looked up, a keccak256 digest is that small with probability 2**-64"""
+
+class SHA3Table:
+    """Read-only view of a preimage table, the file is opened on the first lookup"""
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self._mm:mmap.mmap = None
+        self._buckets:Tuple[int] = None
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size + BUCKETS.size:
+            return
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            mm.close()
+            raise ValueError(f"{self.path} is not a SHA3 preimage table")
+        self._mm = mm
+        self._buckets = BUCKETS.unpack_from(mm, HEADER.size)
+
+    def __len__(self) -> int:
+        if not self._loaded:
+            self._load()
+        return self._buckets[-1] if self._mm is not None else 0
+
+    def get(self, value:int) -> Optional[Tuple[int]]:
+        """The preimage words of the digest `value`, or None if the digest is unknown"""
+        if value.bit_length() < MIN_DIGEST_BITS:
+            return None
+        if not self._loaded:
+            self._load()
+        if self._mm is None:
+            return None
+
+        mm = self._mm
+        digest = value.to_bytes(WORD_SIZE, "big")
+        base = HEADER.size + BUCKETS.size
+        lo, hi = self._buckets[digest[0]], self._buckets[digest[0] + 1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * RECORD_SIZE
+            current = mm[offset:offset + WORD_SIZE]
+            if current < digest:
+                lo = mid + 1
+            elif current > digest:
+                hi = mid
+            else:
+                record = mm[offset:offset + RECORD_SIZE]
+                arity = record[WORD_SIZE]
+                words = record[WORD_SIZE + 1:]
+                return tuple(int.from_bytes(words[i * WORD_SIZE:(i + 1) * WORD_SIZE], "big") for i in range(arity))
+        return None
+
+    def __contains__(self, value:int) -> bool:
+        return self.get(value) is not None
+
+def keccak_words(words:Tuple[int]) -> int:
+    """keccak256 of the 32-byte words, as done by SHA3 on storage keys"""
+    import sha3
+    return int.from_bytes(sha3.keccak_256(b"".join(w.to_bytes(WORD_SIZE, "big") for w in words)).digest(), "big")
+
+def generate_preimages(slots:int, keys:int) -> Iterator[Tuple[int, Tuple[int]]]:
+    """
+        (digest, words) of the common storage layouts
+        - dynamic array bases, `SHA3(slot)`
+        - mappings with small keys, `SHA3(key.slot)` and `SHA3(slot.key)` (Vyper puts the slot first)
+    """
+    for slot in range(slots):
+        yield keccak_words((slot,)), (slot,)
+    for key in range(keys):
+        for slot in range(slots):
+            yield keccak_words((key, slot)), (key, slot)
+            # the pairs with slot < keys and key < slots are already yielded in this order
+            if not (slot < keys and key < slots):
+                yield keccak_words((slot, key)), (slot, key)
+
+def load_json_preimages(path:str) -> Iterator[Tuple[int, Tuple[int]]]:
+    """(digest, words) of a legacy sha3_mappings.json, `{digest: {'key':.., 'index':..}}`"""
+    with open(path, "r") as f:
+        mappings = json.load(f)
+    for digest, preimage in mappings.items():
+        yield int(digest, 16), (preimage['key'], preimage['index'])
+
+def write_table(path:str, preimages:Iterable[Tuple[int, Tuple[int]]]) -> int:
+    """Write the preimages as a sorted table, return the count of records"""
+    records = dict()
+    for digest, words in preimages:
+        if not 1 <= len(words) <= 2:
+            raise ValueError(f"The arity of {hex(digest)} is not in [1,2]")
+        record = digest.to_bytes(WORD_SIZE, "big") + bytes([len(words)])
+        record += b"".join(w.to_bytes(WORD_SIZE, "big") for w in words)
+        records[record[:WORD_SIZE]] = record.ljust(RECORD_SIZE, b"\x00")
+    records = [records[d] for d in sorted(records)]
+
+    buckets = [0] * 257
+    for record in records:
+        buckets[record[0] + 1] += 1
+    for b in range(256):
+        buckets[b + 1] += buckets[b]
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records)))
+        f.write(BUCKETS.pack(*buckets))
+        for record in records:
+            f.write(record)
+    return len(records)
@@ -1,76 +1,305 @@
+import time
 from typing import *
+from collections import defaultdict
 from disco.common.structures.evm_variable import EVMState
 
 import disco.solver.smt as smt
 import z3
+from disco.solver.presolver import Presolver, parse_atom
+from disco.solver.recorder import QueryRecorder
+from disco.solver.feasibility_cache import FeasibilityCache
 from disco.common.structures.tac_tree import OpTree
 
+Decision = Tuple[str, int]
+"""A branch decision, (block ident, 1 iff the JUMPI falls through)"""
+
+Label = Tuple[str, int]
+"""The condition a constraint comes from, (condition pc, 1 iff the JUMPI falls through)"""
+
+class DecisionTrie:
+    """Trie of the branch decisions leading to infeasible paths, any extension of an infeasible prefix is infeasible as well"""
+    _INFEASIBLE = None
+
+    def __init__(self) -> None:
+        self.root = dict()
+        self.n_prefixes = 0
+        self.hits = 0
+
+    def add(self, decisions:Sequence[Decision]):
+        # an empty prefix would cut off every path
+        if len(decisions) == 0: return
+        node = self.root
+        for decision in decisions:
+            if self._INFEASIBLE in node: return
+            node = node.setdefault(decision, dict())
+        # the extensions are covered by this prefix
+        node.clear()
+        node[self._INFEASIBLE] = True
+        self.n_prefixes += 1
+
+    def __contains__(self, decisions:Sequence[Decision]) -> bool:
+        """True iff a prefix of `decisions` is infeasible"""
+        node = self.root
+        for decision in decisions:
+            node = node.get(decision)
+            if node is None:
+                return False
+            if self._INFEASIBLE in node:
+                self.hits += 1
+                return True
+        return False
+
+class ConflictStore:
+    """
+        Unsat cores of the infeasible paths, as the labels of the conditions in conflict.
+        The same condition may lead to different constraints on different paths, so a path is in conflict iff it has all the constraints of a core.
+    """
+    def __init__(self) -> None:
+        self.conflicts:List[Tuple[Tuple[z3.BoolRef], Tuple[Label]]] = []
+        """(constraints, labels), the constraints are kept alive so their ids are not reused"""
+        self._watches:Dict[int, List[int]] = defaultdict(list)
+        """AST id of the first constraint of each core -> indices of the cores"""
+        self._seen:Set[FrozenSet[int]] = set()
+        self.hits = 0
+
+    def add(self, constraints:Sequence[z3.BoolRef], labels:Sequence[Label]):
+        ids = frozenset(e.get_id() for e in constraints)
+        if len(ids) == 0 or ids in self._seen: return
+        self._seen.add(ids)
+        self._watches[min(ids)].append(len(self.conflicts))
+        self.conflicts.append((tuple(constraints), tuple(labels)))
+
+    def find(self, ids:Set[int]) -> Optional[Tuple[Label]]:
+        """The labels of a core made of constraints among the AST `ids`, None if there is none"""
+        for r in ids:
+            for index in self._watches.get(r, ()):
+                constraints, labels = self.conflicts[index]
+                if all(e.get_id() in ids for e in constraints):
+                    self.hits += 1
+                    return labels
+        return None
+
+class SolverBudget:
+    """
+        Timeouts of the z3 queries of a contract and their cumulative time.
+        A query starts with `initial_timeout` ms, an unknown verdict is solved again with `factor` times the timeout up to `max_timeout`
+        if the query is escalated, and no query is solved once `budget` seconds are spent. The unknown verdicts are feasible.
+    """
+    def __init__(self, initial_timeout:int=100, max_timeout:int=1000, factor:int=4, budget:Optional[float]=None) -> None:
+        self.initial_timeout = min(initial_timeout, max_timeout)
+        self.max_timeout = max_timeout
+        self.factor = factor
+        self.budget = budget
+        self.spent = 0.0
+        self.queries = 0
+        self.attempts = 0
+        self.escalations = 0
+        self.timeouts = 0
+        """Attempts ended by their timeout"""
+        self.unknown = 0
+        """Queries left unknown, after their escalations"""
+        self.skipped = 0
+        """Queries not solved, past the budget"""
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, None for no budget"""
+        return None if self.budget is None else max(0.0, self.budget - self.spent)
+
+    def solve(self, solver:z3.Solver, escalate:bool) -> int:
+        """1 (sat), -1 (unsat) or 0 (unknown) of the assertions of `solver`"""
+        self.queries += 1
+        timeout = self.initial_timeout
+        while True:
+            remaining = self.remaining()
+            if remaining is not None and remaining * 1000 < 1:
+                if timeout == self.initial_timeout:
+                    self.skipped += 1
+                else:
+                    self.unknown += 1
+                return 0
+            solver.set("timeout", timeout if remaining is None else min(timeout, int(remaining * 1000)))
+            start = time.perf_counter()
+            r = solver.check().r
+            self.spent += time.perf_counter() - start
+            self.attempts += 1
+            if r != 0:
+                return r
+            if solver.reason_unknown() in ("timeout", "canceled"):
+                self.timeouts += 1
+            if not escalate or timeout >= self.max_timeout:
+                self.unknown += 1
+                return 0
+            timeout = min(timeout * self.factor, self.max_timeout)
+            self.escalations += 1
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {"queries":self.queries, "attempts":self.attempts, "escalations":self.escalations, "timeouts":self.timeouts,
+                "unknown":self.unknown, "skipped":self.skipped, "spent":round(self.spent, 3)}
+
 class Checker:
     def __init__(self) -> None:
-        self.infeasible_path_pres = set()
+        self.infeasible_path_pres = DecisionTrie()
+        """Kept for all the paths of the contract"""
+        self.conflicts = ConflictStore()
+        """Kept for all the paths of the contract"""
         self.tree_smt_mapping = dict()
 
 class PathChecker(Checker):
-    def __init__(self) -> None:
+    def __init__(self, theory:Union[str, smt.Theory]="int", cache:FeasibilityCache=None, budget:SolverBudget=None,
+                 recorder:QueryRecorder=None) -> None:
         """
             This class is a collection of functions that used for checking feasibility
+            @param `theory` encoding of the EVM words, see `smt.THEORIES`
+            @param `budget` timeouts of the queries solved in line, adaptive without a total budget by default
+            @param `recorder` if given, the queries solved by z3 are written with their verdicts
+            @param `cache` if given, the verdicts of the checks left to z3 are looked up in and added to it
         """
         super().__init__()
 
+        # setup solver, it is kept across paths
+        self.theory = smt.get_theory(theory)
+        self.solver = z3.Solver()
+        self.translator = smt.SMTTranslator(self.theory)
+        self.budget = budget if budget is not None else SolverBudget()
+        self.behaviors:Set[str] = set()
+        """pcs of the behaviors behind a feasible check, the unknown checks guarding them are not escalated"""
+        self.frames:List[z3.BoolRef] = []
+        """Constraints asserted in the scopes of the solver, one scope each"""
+        self.frame_atoms = []
+        """Interval atoms of the frames, None for the constraints the presolver cannot reason about"""
+        self.frame_labels:List[Optional[Label]] = []
+        """Conditions of the frames, None for the other constraints (e.g., of SSTOREs)"""
+        self.presolver = Presolver()
+        self.cursor = 0
+        """Number of frames asserted by the current path"""
+        self.pushed_exp:Set[int] = set()
+        """AST ids of the constraints of the current path, the ASTs are kept alive by `frames` so the ids are not reused"""
+        self.cache = cache
+        self.recorder = recorder
+
+        # initial background knowledge, never popped
+        self.push_background_knowledge()
+        self.base = self.cursor
+
         self.reset()
     
-    def add_constraint(self, condTree:OpTree):
-        smt_tree = smt.smt_from_tree(condTree)[0]
-        self.push_to_solver(smt_tree)
+    def add_constraint(self, condTree:OpTree, label:Label=None):
+        smt_tree = self.translator.translate(condTree)[0]
+        self.push_to_solver(smt_tree, label=label)
         self.after_add_constraints = True
         
     def add_sstore(self, key: EVMState, value: OpTree):
-        new_var = smt._UNI_VAR_TYPE(f"{key.details(with_counts=True, with_keys=True)}")
-        self.push_to_solver(new_var == smt.smt_from_tree(value)[0])
+        new_var = self.translator.var(f"{key.details(with_counts=True, with_keys=True)}")
+        self.push_to_solver(new_var == self.translator.translate(value)[0])
 
-    def check(self, current_path_pres:str=""):
+    def check(self, current_path_pres:Sequence[Decision]=(), behaviors:Optional[Sequence[str]]=None):
+        """
+            Returns -1 iff the path with the decisions `current_path_pres` is infeasible, a known infeasible prefix is not solved again.
+            @param `behaviors` pcs of the behaviors guarded by the check, an unknown verdict is escalated iff one of them is new (or if they are not given)
+        """
         sat = 1
         if current_path_pres in self.infeasible_path_pres:
             sat = -1
         else:
-            r = self.solver.check().r
-            if r == -1:
-                self.infeasible_path_pres.add(current_path_pres)
-                return -1
+            # the constraints of the previous path beyond the shared prefix
+            self.pop_to(self.cursor)
+            if self.conflicts.find(self.pushed_exp) is not None:
+                sat = -1
             else:
-                return 1
+                r = self.presolver.check(self.frame_atoms)
+                key = None
+                if r is None and self.cache is not None:
+                    key = self.cache.canonicalizer.key(self.frames[:self.cursor], self.theory.name)
+                    r = self.cache.get(key)
+                if r is None:
+                    start = time.perf_counter()
+                    escalate = behaviors is None or any(behavior not in self.behaviors for behavior in behaviors)
+                    r = self.budget.solve(self.solver, escalate)
+                    if self.recorder is not None:
+                        self.recorder.record(self.to_smt2(), r, self.theory.name, current_path_pres, time.perf_counter() - start)
+                    if key is not None:
+                        self.cache.put(key, r)
+                    if r == -1:
+                        self.learn_conflict()
+                if r == -1:
+                    sat = -1
+            if sat == -1:
+                self.infeasible_path_pres.add(current_path_pres)
+        if sat == 1 and behaviors is not None:
+            self.behaviors.update(behaviors)
 
         return sat
 
     def reset(self):
-        # setup solver
-        self.solver = z3.Solver()
-        self.pushed_exp = set()
-        self.solver.set("timeout", 1000)
+        """
+            Start a new path.
+            The constraints of the previous path stay in the solver, the new path reuses them as long as it pushes the same constraints in the same order,
+            so the constraints of a shared prefix are asserted (and learned from) once.
+        """
+        self.cursor = self.base
+        self.pushed_exp = set(e.get_id() for e in self.frames[:self.base])
 
         self.after_add_constraints = False
 
-        # initial background knowledge
-        self.push_background_knowledge()
+    def to_smt2(self) -> str:
+        """SMT-LIB text of the constraints of the current path, without the assumptions of the theory, the variables are renamed since z3 does not quote the names like `0x40`"""
+        renamed = [(v, z3.Const(f"v{i}", v.sort())) for i, v in enumerate(self.translator.vars.values())]
+        solver = z3.Solver()
+        solver.add(*(z3.substitute(e, *renamed) for e in self.frames[:self.cursor]))
+        return solver.to_smt2()
+
+    def pop_to(self, n_frames:int):
+        """Pop the scopes of the frames after the first `n_frames`"""
+        if len(self.frames) > n_frames:
+            self.solver.pop(len(self.frames) - n_frames)
+            del self.frames[n_frames:]
+            del self.frame_atoms[n_frames:]
+            del self.frame_labels[n_frames:]
+
+    def learn_conflict(self):
+        """Keep the unsat core of the current path if all its constraints come from conditions"""
+        indices = [int(str(track).split("!")[1]) for track in self.solver.unsat_core()]
+        if len(indices) == 0 or any(self.frame_labels[index] is None for index in indices):
+            return
+        self.conflicts.add([self.frames[index] for index in indices], [self.frame_labels[index] for index in indices])
 
     def push_type_constraint(self, type_name:str, var_name:str):
         if self.type_might_unsigned(type_name):
             if type_name == "address":
-                self.push_to_solver(smt._UNI_VAR_TYPE(var_name) > 0)
+                self.push_to_solver(self.theory.ugt(self.translator.var(var_name), 0))
             else:
-                self.push_to_solver(smt._UNI_VAR_TYPE(var_name) >= 0)
+                self.push_to_solver(self.theory.uge(self.translator.var(var_name), 0))
 
-    def push_to_solver(self, constraint: z3.ExprRef):
-        e = self.bool_ref_wrapper(constraint)
-        r = smt.smt_repr(e)
-        if r not in self.pushed_exp:
-            self.pushed_exp.add(r)
-            self.solver.add(e)
+    def push_to_solver(self, constraint: z3.ExprRef, label:Label=None, track:bool=True):
+        """
+            @param `label` the condition of the constraint
+            @param `track` track the constraint in the unsat cores, the untracked constraints must hold on every path
+        """
+        e = self.bool_ref_wrapper(constraint, self.theory)
+        # z3 hash-conses the ASTs, equal constraints have the same id
+        r = e.get_id()
+        if r in self.pushed_exp:
+            return
+        self.pushed_exp.add(r)
+        if self.cursor < len(self.frames) and self.frames[self.cursor].get_id() == r:
+            # asserted by the previous path with the same prefix
+            self.cursor += 1
+            return
+        self.pop_to(self.cursor)
+        self.solver.push()
+        if track:
+            self.solver.assert_and_track(self.theory.assume(e), f"track!{len(self.frames)}")
+        else:
+            self.solver.add(self.theory.assume(e))
+        self.frames.append(e)
+        self.frame_atoms.append(parse_atom(e, self.theory.int_bits))
+        self.frame_labels.append(label)
+        self.cursor += 1
 
     def push_background_knowledge(self):
         # pass
-        # self.push_to_solver(smt._UNI_VAR_TYPE("CALLER") != 0)
-        self.push_to_solver(smt._UNI_VAR_TYPE("TIMESTAMP") > 0)
+        # self.push_to_solver(self.translator.var("CALLER") != 0)
+        self.push_to_solver(self.theory.ugt(self.translator.var("TIMESTAMP"), 0), track=False)
 
     @staticmethod
     def type_might_unsigned(type_name:str):
@@ -87,11 +316,14 @@ class PathChecker(Checker):
         return True
 
     @staticmethod
-    def bool_ref_wrapper(a:z3.ExprRef):
+    def bool_ref_wrapper(a:z3.ExprRef, theory:smt.Theory=None):
         """
             Given a z3 expression, return the BoolRef of the expression
         """
-        if smt._is_if_expr(a):
+        if isinstance(a, (bool, int)):
+            # folded constant conditions
+            return z3.BoolVal(bool(a))
+        if theory is not None and theory.is_if_expr(a):
             # IF(BOOL_EXPR, 1, 0)  ===> BOOL_EXPR
             return a.arg(0)
         if not isinstance(a, z3.z3.BoolRef):
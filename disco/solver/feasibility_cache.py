@@ -0,0 +1,106 @@
+"""
+    On-disk cache of the verdicts of the feasibility checks, shared by the contracts and by the batch workers.
+    The same guards (e.g., `CALLER == S(0)`, reentrancy locks, overflow checks) show up in many contracts under other symbol names,
+    so a set of constraints is keyed up to the renaming of its symbols and the order of its conjuncts.
+"""
+import hashlib
+import sqlite3
+from typing import *
+
+import z3
+
+Template = Tuple[str, Tuple[str]]
+"""(rendering of a constraint with its symbols numbered by first occurrence, names of the symbols in that order)"""
+
+_PLACEHOLDER = "sym!{}"
+
+class ConstraintCanonicalizer:
+    """Canonical keys of constraint sets, the templates of the constraints are memoized"""
+    def __init__(self) -> None:
+        self._templates:Dict[int, Tuple[z3.ExprRef, Template]] = dict()
+        """AST id -> (AST, template), the ASTs are kept alive so the ids are not reused"""
+
+    def template(self, e:z3.ExprRef) -> Template:
+        cached = self._templates.get(e.get_id())
+        if cached is not None:
+            return cached[1]
+
+        # the symbols in the order of a pre-order walk, the shared subterms are walked once
+        symbols = dict()
+        visited = set()
+        stack = [e]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.get_id() in visited: continue
+            visited.add(node.get_id())
+            if z3.is_const(node) and node.decl().kind() == z3.Z3_OP_UNINTERPRETED:
+                symbols.setdefault(node.decl().name(), node)
+            elif z3.is_app(node):
+                stack.extend(reversed(node.children()))
+
+        renamed = [(symbol, z3.Const(_PLACEHOLDER.format(i), symbol.sort())) for i, symbol in enumerate(symbols.values())]
+        rendering = z3.substitute(e, *renamed).sexpr() if renamed else e.sexpr()
+        template = (rendering, tuple(symbols))
+        self._templates[e.get_id()] = (e, template)
+        return template
+
+    def key(self, constraints:Iterable[z3.ExprRef], theory:str) -> str:
+        """
+            Equal keys for the sets of constraints equal up to a bijective renaming of their symbols, in the same `theory`.
+            The constraints are sorted by template, the symbols are numbered across the sorted constraints.
+        """
+        # the ties keep the order of the constraints, and may only miss a hit
+        templates = sorted(dict.fromkeys(self.template(e) for e in constraints), key=lambda template: template[0])
+        numbers = dict()
+        lines = [theory]
+        for rendering, names in templates:
+            lines.append(rendering + " " + ",".join(str(numbers.setdefault(name, len(numbers))) for name in names))
+        return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+class FeasibilityCache:
+    """
+        Verdicts (1 for sat, -1 for unsat) of the constraint sets by canonical key, in a SQLite file.
+        The unknown verdicts are not stored, they depend on the timeouts.
+    """
+    COMMIT_EVERY = 64
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        # the batch workers share the file, a writer waits for the others
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict INTEGER NOT NULL)")
+        self._conn.commit()
+        self.canonicalizer = ConstraintCanonicalizer()
+        self._uncommitted = 0
+        self.lookups = 0
+        self.hits = 0
+        self.stored = 0
+
+    def get(self, key:str) -> Optional[int]:
+        self.lookups += 1
+        row = self._conn.execute("SELECT verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key:str, verdict:int):
+        if verdict not in (1, -1): return
+        self._conn.execute("INSERT OR IGNORE INTO verdicts (key, verdict) VALUES (?, ?)", (key, verdict))
+        self.stored += 1
+        self._uncommitted += 1
+        if self._uncommitted >= self.COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {"lookups":self.lookups, "hits":self.hits, "stored":self.stored,
+                "hit_rate":round(self.hits / self.lookups, 3) if self.lookups else 0.0}
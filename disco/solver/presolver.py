@@ -0,0 +1,140 @@
+"""
+    Interval reasoning on the constraints comparing a symbol with a constant, e.g., `CALLVALUE == 0`, `CALLDATASIZE < 4`, `TIMESTAMP > c`.
+    A conjunction of such atoms is decided without z3, the other constraints are left to the solver.
+"""
+from typing import *
+
+import z3
+
+Symbol = Tuple[str, int]
+"""(name, sort kind) of a z3 constant"""
+
+Atom = Tuple[Symbol, str, Union[int, Symbol], Optional[int]]
+"""(symbol, operator, constant, width of the symbol, None for Int), the symbol is on the left. The operator `same` equates two symbols."""
+
+TRUE_ATOM = (("", 0), "true", 0, None)
+FALSE_ATOM = (("", 0), "false", 0, None)
+
+_NEGATED = {"==":"!=", "!=":"==", "<":">=", ">=":"<", "<=":">", ">":"<="}
+_FLIPPED = {"==":"==", "!=":"!=", "<":">", ">":"<", "<=":">=", ">=":"<="}
+
+_INT_OPS = {z3.Z3_OP_EQ:"==", z3.Z3_OP_DISTINCT:"!=", z3.Z3_OP_LT:"<", z3.Z3_OP_LE:"<=", z3.Z3_OP_GT:">", z3.Z3_OP_GE:">="}
+# only the unsigned comparisons of bit-vectors are intervals of [0, 2**width)
+_BV_OPS = {z3.Z3_OP_EQ:"==", z3.Z3_OP_DISTINCT:"!=", z3.Z3_OP_ULT:"<", z3.Z3_OP_ULEQ:"<=", z3.Z3_OP_UGT:">", z3.Z3_OP_UGEQ:">="}
+
+def _is_symbol(e:z3.ExprRef) -> bool:
+    return z3.is_const(e) and e.decl().kind() == z3.Z3_OP_UNINTERPRETED
+
+def _symbol(e:z3.ExprRef) -> Symbol:
+    return (e.decl().name(), e.sort_kind())
+
+def _constant(e:z3.ExprRef) -> Optional[int]:
+    if z3.is_int_value(e) or z3.is_bv_value(e):
+        return e.as_long()
+    return None
+
+def parse_atom(e:z3.BoolRef, int_bits:Optional[int]=None) -> Optional[Atom]:
+    """
+        The atom of a `symbol <op> constant` constraint, None for any other constraint
+        @param `int_bits` width of the Int symbols when they are assumed to range over [0, 2**int_bits), None for unbounded
+    """
+    negated = False
+    while z3.is_not(e):
+        negated = not negated
+        e = e.arg(0)
+    if z3.is_true(e) or z3.is_false(e):
+        return FALSE_ATOM if z3.is_true(e) == negated else TRUE_ATOM
+    if not z3.is_app(e) or e.num_args() != 2:
+        return None
+
+    a, b = e.arg(0), e.arg(1)
+    if z3.is_int(a):
+        op, width = _INT_OPS.get(e.decl().kind()), int_bits
+    elif z3.is_bv(a):
+        op, width = _BV_OPS.get(e.decl().kind()), a.size()
+    else:
+        return None
+    if op is None:
+        return None
+
+    if _is_symbol(a) and _is_symbol(b) and op == "==" and not negated:
+        return (_symbol(a), "same", _symbol(b), width)
+    if _is_symbol(a) and _constant(b) is not None:
+        symbol, value = a, _constant(b)
+    elif _is_symbol(b) and _constant(a) is not None:
+        symbol, value, op = b, _constant(a), _FLIPPED[op]
+    else:
+        return None
+    if negated:
+        op = _NEGATED[op]
+    return (_symbol(symbol), op, value, width)
+
+def decide(atoms:Iterable[Atom]) -> bool:
+    """True iff the conjunction of the atoms is satisfiable"""
+    atoms = list(atoms)
+    # the equated symbols share their bounds
+    parents:Dict[Symbol, Symbol] = dict()
+    def find(symbol:Symbol) -> Symbol:
+        while parents.get(symbol, symbol) != symbol:
+            # path halving, the parent is written before moving up
+            parents[symbol] = parents.get(parents[symbol], parents[symbol])
+            symbol = parents[symbol]
+        return symbol
+    for symbol, op, value, _ in atoms:
+        if op == "same":
+            parents[find(symbol)] = find(value)
+
+    bounds:Dict[Symbol, List] = dict()
+    for symbol, op, value, width in atoms:
+        if op in ("true", "same"): continue
+        if op == "false": return False
+        symbol = find(symbol)
+        if symbol not in bounds:
+            # lower bound, upper bound (None for unbounded), excluded values
+            bounds[symbol] = [None, None, set()] if width is None else [0, (1 << width) - 1, set()]
+        bound = bounds[symbol]
+        lo, hi = bound[0], bound[1]
+        if op == "==":
+            lo, hi = value, value
+            if bound[0] is not None and bound[0] > value: return False
+            if bound[1] is not None and bound[1] < value: return False
+        elif op == "!=":
+            bound[2].add(value)
+        elif op == "<":
+            hi = value - 1 if hi is None else min(hi, value - 1)
+        elif op == "<=":
+            hi = value if hi is None else min(hi, value)
+        elif op == ">":
+            lo = value + 1 if lo is None else max(lo, value + 1)
+        elif op == ">=":
+            lo = value if lo is None else max(lo, value)
+        if lo is not None and hi is not None and lo > hi:
+            return False
+        bound[0], bound[1] = lo, hi
+
+    for lo, hi, excluded in bounds.values():
+        # the interval is fully excluded, it has at most len(excluded) values
+        if lo is not None and hi is not None and hi - lo + 1 <= len(excluded):
+            if all(v in excluded for v in range(lo, hi + 1)):
+                return False
+    return True
+
+class Presolver:
+    """Decides the paths whose constraints are all atoms, and refutes the paths whose atoms are already unsatisfiable"""
+    def __init__(self) -> None:
+        self.settled = 0
+        self.queries = 0
+
+    def check(self, atoms:Sequence[Optional[Atom]]) -> Optional[int]:
+        """1 (sat), -1 (unsat) or None if the solver is needed, `atoms` has None for the constraints which are not atoms"""
+        self.queries += 1
+        if not decide(atom for atom in atoms if atom is not None):
+            self.settled += 1
+            return -1
+        if all(atom is not None for atom in atoms):
+            self.settled += 1
+            return 1
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {"queries":self.queries, "settled":self.settled}
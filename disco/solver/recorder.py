@@ -0,0 +1,40 @@
+"""
+    Capture of the queries solved by z3, one SMT-LIB2 file per check, replayed offline by `benchmarks/smt_replay.py`.
+    The constraints are written without the assumptions of the theory (see `smt.Theory.assume`), the replay adds the ones of the theory it solves in.
+"""
+import os
+from typing import *
+
+STATUS = {1:"sat", -1:"unsat", 0:"unknown"}
+
+class QueryRecorder:
+    """Writes `<directory>/<number>.smt2`, the header comments give the theory, the decisions of the path, the solve time and the verdict"""
+    def __init__(self, directory:str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.n_queries = 0
+
+    def record(self, text:str, verdict:int, theory:str, decisions:Sequence[Tuple[str, int]]=(), elapsed:Optional[float]=None) -> str:
+        """Writes the SMT-LIB `text` of a query, returns the path of the file"""
+        path = os.path.join(self.directory, f"{self.n_queries:06d}.smt2")
+        self.n_queries += 1
+        header = [f"; theory: {theory}", f"; status: {STATUS[verdict]}",
+                  f"; decisions: {' '.join(f'{ident}:{direction}' for ident, direction in decisions)}"]
+        if elapsed is not None:
+            header.append(f"; time: {elapsed:.6f}")
+        # z3 writes the status as unknown
+        text = text.replace("(set-info :status unknown)", f"(set-info :status {STATUS[verdict]})", 1)
+        with open(path, "w") as f:
+            f.write("\n".join(header) + "\n" + text)
+        return path
+
+def read_header(path:str) -> Dict[str, str]:
+    """The header comments of a recorded query"""
+    header = dict()
+    with open(path, "r") as f:
+        for line in f:
+            if not line.startswith("; ") or ": " not in line:
+                break
+            name, value = line[2:].rstrip("\n").split(": ", 1)
+            header[name] = value
+    return header
@@ -1,78 +1,197 @@
 # -*- coding:utf-8 -*-
 
 import z3
-from functools import partial
-
-from disco.common.structures.tac_tree import OpTree
-
-_UNI_VAR_TYPE = partial(z3.Int, ctx=None)
-_UNI_CONST_TYPE = partial(z3.Int, ctx=None)
-
-def _IS_UNI_VAR_TYPE(x): return isinstance(x, z3.z3.BitVecRef)
+from typing import *
 
+from disco.common.structures.tac_tree import OpTree, TreeKey, fold_tree
 
 two_power = dict(zip(map(lambda x: 1 << x, (i for i in range(1, 257))), list(
     i for i in range(1, 257))))
 
-USE_UNSIGNED = True
-
-def universe_func(arg1, arg2, operator: str):
+class Theory:
     """
-        In z3, `Boolean` and `BitVec` are different types and cannot mix up when calculated. 
+        Encoding of the EVM words in z3, configured per checker.
+        The translations of different theories do not mix, a theory is kept for the life of a solver.
     """
-    _table = {
-        "AND": (lambda x, y: x & y, z3.And),
-        "OR": (lambda x, y: x | y, z3.Or),
-    }
-    if isinstance(arg1, z3.z3.BitVecRef) or isinstance(arg2, z3.z3.BitVecRef):
-        return _table[operator][0](arg1, arg2)
-    elif isinstance(arg1, int) and isinstance(arg2, int):
-        return _table[operator][0](arg1, arg2)
-    else:
-        return _table[operator][1](arg1, arg2)
+    name:str = None
+    unsigned:bool = False
+    """Default of `use_unsigned`, i.e., whether DIV, MOD, GT and LT are unsigned"""
+    int_bits:Optional[int] = None
+    """The Int variables range over [0, 2**int_bits), None for unbounded"""
 
+    def __init__(self) -> None:
+        self._tables = {use_unsigned:self._table(use_unsigned) for use_unsigned in (False, True)}
 
-def _div(x, y, sdiv=False):
-    return ((x / y) if (not USE_UNSIGNED or sdiv) else z3.UDiv(x, y))
+    def var(self, name:str) -> z3.ExprRef:
+        raise NotImplementedError
 
+    def const(self, value:int) -> z3.ExprRef:
+        raise NotImplementedError
 
-def _mul(x, y):
-    if isinstance(y, int):
-        if y in two_power:
-            return (x << two_power[y])
-    return x * y
+    def is_word(self, x) -> bool:
+        raise NotImplementedError
 
+    def word(self, x):
+        """`x` as a word, z3 coerces the BoolRefs mixed with integers on its own"""
+        return x
 
-def _is_if_expr(a: z3.z3.ExprRef):
-    if _IS_UNI_VAR_TYPE(a):
-        if (a.num_args() == 3 and repr(a).startswith("If") and isinstance(a.arg(0), z3.z3.BoolRef) and
-                z3.eq(a.arg(1), _UNI_CONST_TYPE(1)) and z3.eq(a.arg(2), _UNI_CONST_TYPE(0))):
-            return True
-    return False
+    def udiv(self, x, y): return x / y
+    def urem(self, x, y): return x % y
+    def ugt(self, x, y): return x > y
+    def ult(self, x, y): return x < y
+    def uge(self, x, y): return x >= y
 
+    def assume(self, e:z3.BoolRef) -> z3.BoolRef:
+        """`e` with the assumptions of the theory on its variables"""
+        return e
 
-def _not(arg, return_ref: str = "value"):
-    """
-        calculate the NOT expression of an smt
-        @param return_ref: "value" ==> return a value expression, e.g. If(a==0, 1, 0)
-                            "bool" ==> return a bool expression, e.g. a==0 
-    """
-    if return_ref == "value":
-        if isinstance(arg, z3.z3.BoolRef):
-            return z3.Not(arg)
-        elif _is_if_expr(arg):
-            return z3.Not(arg.arg(0))
-        else:
-            return arg == 0
-    elif return_ref == "bool":
-        if isinstance(arg, z3.z3.BoolRef):
+    def is_if_expr(self, a:z3.ExprRef) -> bool:
+        """True iff `a` is If(BOOL_EXPR, 1, 0)"""
+        return (self.is_word(a) and z3.is_app_of(a, z3.Z3_OP_ITE) and isinstance(a.arg(0), z3.BoolRef) and
+                z3.eq(a.arg(1), self.const(1)) and z3.eq(a.arg(2), self.const(0)))
+
+    def not_(self, arg, return_ref:str = "value"):
+        """
+            calculate the NOT expression of an smt
+            @param return_ref: "value" ==> return a value expression, e.g. If(a==0, 1, 0)
+                                "bool" ==> return a bool expression, e.g. a==0 
+        """
+        assert return_ref in ("value", "bool")
+        if isinstance(arg, z3.BoolRef):
             return z3.Not(arg)
-        elif _is_if_expr(arg):
+        elif self.is_if_expr(arg):
             return z3.Not(arg.arg(0))
         else:
             return arg == 0
-    else:
-        assert 0
+
+    def mul(self, x, y):
+        if isinstance(y, int):
+            if y in two_power:
+                return (x << two_power[y])
+        return x * y
+
+    def funcs(self, use_unsigned:bool) -> Dict[str, Callable]:
+        return self._tables[use_unsigned]
+
+    def _table(self, use_unsigned:bool) -> Dict[str, Callable]:
+        # Here, we only need to consider some part of operations
+        table = {
+            "ADD": lambda x, y: x + y,
+            "SUB": lambda x, y: x - y,
+            "MOD": self.urem if use_unsigned else (lambda x, y: x % y),
+            "DIV": self.udiv if use_unsigned else (lambda x, y: x / y),
+            "SDIV": lambda x, y: x / y,
+            "MUL": self.mul,
+            "GT": self.ugt if use_unsigned else (lambda x, y: x > y),
+            "SGT": lambda x, y: x > y,
+            "LT": self.ult if use_unsigned else (lambda x, y: x < y),
+            "SLT": lambda x, y: x < y,
+            "EQ": lambda x, y: x == y,
+        }
+        word = self.word
+        table = {name:(lambda func: lambda x, y: func(word(x), word(y)))(func) for name, func in table.items()}
+        table["ISZERO"] = self.not_
+        table["NOT"] = self.not_
+        return table
+
+class IntTheory(Theory):
+    """Unbounded integers, signed and unsigned operations are the same"""
+    name = "int"
+
+    def var(self, name:str) -> z3.ExprRef:
+        return z3.Int(name)
+
+    def const(self, value:int) -> z3.ExprRef:
+        return z3.IntVal(value)
+
+    def is_word(self, x) -> bool:
+        return isinstance(x, z3.ArithRef)
+
+class BitVecTheory(Theory):
+    """256-bit vectors, the exact EVM arithmetic with wrap-around, the unsigned operations are the default"""
+    name = "bv"
+    unsigned = True
+
+    def __init__(self, word_bits:int=256) -> None:
+        self.word_bits = word_bits
+        super().__init__()
+
+    def var(self, name:str) -> z3.ExprRef:
+        return z3.BitVec(name, self.word_bits)
+
+    def const(self, value:int) -> z3.ExprRef:
+        return z3.BitVecVal(value, self.word_bits)
+
+    def is_word(self, x) -> bool:
+        return isinstance(x, z3.BitVecRef)
+
+    def word(self, x):
+        """`x` as a word, a BoolRef is If(BOOL_EXPR, 1, 0)"""
+        if isinstance(x, z3.BoolRef):
+            return z3.If(x, self.const(1), self.const(0))
+        return x
+
+    def udiv(self, x, y): return z3.UDiv(x, y)
+    def urem(self, x, y): return z3.URem(x, y)
+    def ugt(self, x, y): return z3.UGT(x, y)
+    def ult(self, x, y): return z3.ULT(x, y)
+    def uge(self, x, y): return z3.UGE(x, y)
+
+class HybridTheory(IntTheory):
+    """
+        Integer arithmetic on variables ranging over [0, 2**256), the overflows are not modelled.
+        The range of the variables of a constraint is conjoined to it by `assume`.
+    """
+    name = "hybrid"
+    int_bits = 256
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._bounds:Dict[str, z3.BoolRef] = dict()
+        self._symbols:Dict[int, Tuple[z3.ExprRef, FrozenSet[str]]] = dict()
+        """AST id -> (AST, names of its variables), the ASTs are kept alive so the ids are not reused"""
+
+    def assume(self, e:z3.BoolRef) -> z3.BoolRef:
+        names = sorted(self.symbols(e))
+        if len(names) == 0:
+            return e
+        return z3.And(e, *(self._bounds[name] for name in names))
+
+    def symbols(self, e:z3.ExprRef) -> FrozenSet[str]:
+        memo = self._symbols
+
+        def children(node:z3.ExprRef):
+            if node.get_id() in memo or not z3.is_app(node):
+                return []
+            return node.children()
+
+        def combine(node:z3.ExprRef, sons, sons_symbols):
+            key = node.get_id()
+            if key not in memo:
+                if z3.is_const(node) and node.decl().kind() == z3.Z3_OP_UNINTERPRETED and z3.is_int(node):
+                    name = node.decl().name()
+                    if name not in self._bounds:
+                        self._bounds[name] = z3.And(node >= 0, node < (1 << self.int_bits))
+                    names = frozenset((name,))
+                else:
+                    names = frozenset().union(*sons_symbols)
+                memo[key] = (node, names)
+            return memo[key][1]
+
+        return fold_tree(e, children, combine)
+
+THEORIES:Dict[str, Type[Theory]] = {theory.name:theory for theory in (IntTheory, BitVecTheory, HybridTheory)}
+
+def get_theory(theory:Union[str, Theory, None] = None) -> Theory:
+    """A new theory by name, `int` by default"""
+    if isinstance(theory, Theory):
+        return theory
+    name = IntTheory.name if theory is None else theory
+    if name not in THEORIES:
+        raise ValueError(f"Unknown SMT theory {name}, expected one of {', '.join(THEORIES)}")
+    return THEORIES[name]()
+
+_INT_THEORY = IntTheory()
 
 def smt_repr(smt):
     """
@@ -85,72 +204,125 @@ def safe_str(obj):
     """
         convert obj into a safe expression that could be used as z3 var name
     """
-    if _IS_UNI_VAR_TYPE(obj):
+    if isinstance(obj, z3.ExprRef):
         obj = z3.simplify(obj)
     ret = str(obj)
     return ret.replace(' ', '_').replace("\n", '_')
 
-# Here, we only need to consider some part of operations
-SMT_FUNC_TABLE = {
-    "ADD": lambda x, y: x + y,
-    "SUB": lambda x, y: x - y,
-    "MOD": lambda x, y: (x % y),
-    "DIV": lambda x, y: _div(x, y),
-    "SDIV": lambda x, y: _div(x, y, sdiv=True),
-    "MUL": lambda x, y: _mul(x, y),
-    "GT": lambda x, y: x > y if not USE_UNSIGNED else z3.UGT(x, y),
-    "SGT": lambda x, y: x > y,
-    "LT": lambda x, y: x < y if not USE_UNSIGNED else z3.ULT(x, y),
-    "SLT": lambda x, y: x < y,
-    "EQ": lambda x, y: x == y,
-    "ISZERO": _not,
-    "NOT": _not
-}
-
-
-def smt_one_node(name: str, use_unsigned=False, *args):
+class SMTTranslator:
+    """
+        Translation of OpTrees into z3 in a theory, kept for the life of a solver.
+        Trees are cached by their structural key (see `OpTree.key`) and the `use_unsigned` mode, variables are interned by name.
+    """
+    def __init__(self, theory:Union[str, Theory, None] = None) -> None:
+        self.theory = get_theory(theory)
+        self.trees = dict()
+        self.vars = dict()
+        self.tree_hits = 0
+        self.tree_misses = 0
+        self.var_hits = 0
+        self.var_misses = 0
+
+    def var(self, name:str):
+        v = self.vars.get(name)
+        if v is None:
+            self.var_misses += 1
+            v = self.vars[name] = self.theory.var(name)
+        else:
+            self.var_hits += 1
+        return v
+
+    def translate(self, tree:OpTree, use_unsigned:Optional[bool] = None):
+        """`use_unsigned` defaults to the one of the theory"""
+        if use_unsigned is None:
+            use_unsigned = self.theory.unsigned
+        return smt_from_tree(tree, use_unsigned=use_unsigned, translator=self)
+
+    def stats(self):
+        return {"trees":len(self.trees), "tree_hits":self.tree_hits, "tree_misses":self.tree_misses,
+                "vars":len(self.vars), "var_hits":self.var_hits, "var_misses":self.var_misses}
+
+def smt_one_node(name: str, use_unsigned=False, *args, translator:SMTTranslator=None, theory:Theory=None):
     """
         given node name, return a value, i.e. an instance of `z3.z3.ArithRef` or `z3.z3.BitVecRef`
         @param `name` the current node name 
-        @param `use_unsigned` boolean, if true, then will use (z3.UDiv, z3.ULT, z3.UGT) instead of (/, <, >)
-        @param `replace_target` a List of (tuple of (old, new)), replacement will happened before create a var
-        TODO: for now the `SMT_EXT_TABLE` is still naive. Expand this table when encounter new opcodes
+        @param `use_unsigned` boolean, if true, then will use the unsigned operations of the theory, e.g. (z3.UDiv, z3.ULT, z3.UGT) instead of (/, <, >)
+        @param `translator` if given, interns the created var
+        @param `theory` defaults to the one of `translator`, or to unbounded integers
+        TODO: for now the table of the theory is still naive. Expand this table when encounter new opcodes
     """
-    global USE_UNSIGNED
-    USE_UNSIGNED = use_unsigned
-    if name in SMT_FUNC_TABLE:
-        return SMT_FUNC_TABLE[name](*args), 0
+    if theory is None:
+        theory = translator.theory if translator is not None else _INT_THEORY
+    funcs = theory.funcs(use_unsigned)
+    if name in funcs:
+        return funcs[name](*args), 0
     else:
-        return _UNI_VAR_TYPE(f"{str(name)}_{'_'.join(str(arg) for arg in args)}"), 0
+        var_name = f"{str(name)}_{'_'.join(str(arg) for arg in args)}"
+        return (theory.var(var_name) if translator is None else translator.var(var_name)), 0
     
-def smt_from_tree(tree:OpTree, target_name = None, use_unsigned = False, force_regen=True):
-    if not force_regen and tree._smt is not None:
-        return tree._smt
-    
-    if tree.alias_evm_variable:
-        # if hasattr(tree.alias_evm_variable,'type'):# EVM State
-        #     _var_name = tree.alias_evm_variable.details()
-        # else:
-        #     _var_name = str(tree.alias_evm_variable)
-
-        _var_name = tree.details(with_counts=True, with_keys=True)
-        tree._smt = (_UNI_VAR_TYPE(_var_name), 0 if tree.alias_evm_variable == target_name else 1)
-    
-    else:
-        is_numeric, numeric_value = tree._is_numeric()
-        if is_numeric:
-            tree._smt = (numeric_value, 0)
-                
+def smt_from_tree(tree:OpTree, target_name = None, use_unsigned = False, force_regen=True, translator:SMTTranslator=None, theory:Theory=None):
+    """
+        translate `tree` into z3, returns (smt, number of vars other than `target_name`)
+        @param `translator` if given (and without `target_name`, with `force_regen`), the translations of the subtrees are looked up in and added to its cache
+        @param `theory` defaults to the one of `translator`, or to unbounded integers
+    """
+    if theory is None:
+        theory = translator.theory if translator is not None else _INT_THEORY
+    cache = translator.trees if translator is not None and target_name is None and force_regen else None
+
+    def children(node:OpTree):
+        if (not force_regen and node._smt is not None) or node.alias_evm_variable or node.value is not None:
+            return []
+        if cache is not None:
+            # the subtrees with a known key are not visited when they are cached
+            key = node.shallow_key()
+            if key is not None and (key, use_unsigned) in cache:
+                return []
+        return node.sons
+
+    def combine(node:OpTree, sons, sons_smts):
+        return _combine(node, sons_smts)
+
+    def combine_cached(node:OpTree, sons, sons_values):
+        # the keys are computed along the translations, (key, smt) per node
+        key = node.shallow_key()
+        if key is None:
+            key = TreeKey.of(node, [son_key for son_key, _ in sons_values])
+        cached = cache.get((key, use_unsigned))
+        if cached is not None:
+            translator.tree_hits += 1
+            node._smt = cached
+            return key, cached
+        translator.tree_misses += 1
+        cache[(key, use_unsigned)] = _combine(node, [son_smt for _, son_smt in sons_values])
+        return key, cache[(key, use_unsigned)]
+
+    def _combine(node:OpTree, sons_smts):
+        if not force_regen and node._smt is not None:
+            return node._smt
+
+        if node.alias_evm_variable:
+            # if hasattr(node.alias_evm_variable,'type'):# EVM State
+            #     _var_name = node.alias_evm_variable.details()
+            # else:
+            #     _var_name = str(node.alias_evm_variable)
+
+            _var_name = node.details(with_counts=True, with_keys=True)
+            _var = theory.var(_var_name) if translator is None else translator.var(_var_name)
+            node._smt = (_var, 0 if node.alias_evm_variable == target_name else 1)
+
         else:
-            var_cnt = 0
-            sons_smts = []
-            for son in tree.sons:
-                son_smt, _cnt = smt_from_tree(son, target_name, use_unsigned, force_regen)
-                var_cnt += _cnt 
-                sons_smts.append(son_smt)
-            sons_smts = tuple(sons_smts)
-
-            s, _cnt = smt_one_node(tree.name, use_unsigned, *sons_smts)
-            tree._smt = (s, var_cnt + _cnt)
-    
-    return tree._smt
\ No newline at end of file
+            is_numeric, numeric_value = node._is_numeric()
+            if is_numeric:
+                node._smt = (numeric_value, 0)
+
+            else:
+                var_cnt = sum(_cnt for _, _cnt in sons_smts)
+                s, _cnt = smt_one_node(node.name, use_unsigned, *(son_smt for son_smt, _ in sons_smts), translator=translator, theory=theory)
+                node._smt = (s, var_cnt + _cnt)
+        return node._smt
+
+    # sons are translated before their father, without recursion
+    if cache is not None:
+        return fold_tree(tree, children, combine_cached)[1]
+    return fold_tree(tree, children, combine)
\ No newline at end of file
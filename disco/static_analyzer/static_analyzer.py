@@ -4,7 +4,7 @@ import time
 from typing import *
 
 from disco.common.exceptions.MemoryHandlingExceptions import MemoryHandlingException
-from disco.common.lifting.evm_path_parse import transform_from_evm_path
+from disco.common.lifting.evm_path_parse import code_buffer, transform_from_evm_path
 from disco.common.lifting.extractors.extract_semantic_units import extract_semantic_units
 from disco.common.lifting.extractors.extract_state_variables import extract_state_variables
 from disco.common.lifting.function_analyzer import analyze_functions
@@ -12,6 +12,9 @@ from disco.common.lifting.variables_analyzer import EVMVariableAnalyzer
 from disco.common.structures.evm_path import EVMPath
 from disco.common.utils.contract_utils import get_language
 from disco.common.visualization.cfg_visualizer import CFGDotExporter
+from disco.solver.checker import PathChecker, SolverBudget
+from disco.solver.feasibility_cache import FeasibilityCache
+from disco.solver.recorder import QueryRecorder
 from disco.static_analyzer.evm_op_parse import build_cfg_from_ops, get_evm_ops_from_bytecode
 
 logger = logging.getLogger(__name__)
@@ -26,7 +29,8 @@ def prepare_input_files(address:str, working_dir:str="./") -> Tuple[str, str]:
         bytecode = f.read().strip()
     return bytecode
 
-def static_analyzer(address, working_dir="./", loop_uncover_times:int=5):
+def static_analyzer(address, working_dir="./", loop_uncover_times:int=5, smt_theory:str="int", checker:PathChecker=None, solver_timeout:Optional[float]=None, feasibility_cache:Optional[str]=None,
+                    query_timeouts:Tuple[int, int]=(100, 1000), record_queries:bool=False, codecopy_constants:bool=False):
     """
     Main function to perform static analysis on smart contract bytecode
     
@@ -34,6 +38,13 @@ def static_analyzer(address, working_dir="./", loop_uncover_times:int=5):
         address: Contract address
         working_dir: Directory containing input files and where output will be saved
         loop_uncover_times: Number of times to unroll loops during analysis
+        smt_theory: Encoding of the EVM words in the feasibility checks, `int`, `bv` (256-bit vectors) or `hybrid` (bounded integers)
+        checker: Feasibility checker of the semantic units, a new one in `smt_theory` by default
+        solver_timeout: Solver budget of the contract in seconds, the checks past it are taken as feasible
+        feasibility_cache: SQLite file of the verdicts of the feasibility checks, shared across contracts and runs
+        query_timeouts: Initial and maximal timeouts of a query in ms, the unknown queries guarding new behaviors are escalated up to the maximal one
+        record_queries: Write the queries solved by z3 as SMT-LIB2 files under `working_dir/smt2_queries`, for `benchmarks/smt_replay.py`
+        codecopy_constants: Lift the CODECOPY of constant ranges into the words of the bytecode, instead of symbolic CODECOPY values (changes the lifted memory, and so the results)
     """
     logger.info(f"Started static analysis at {time.strftime('%Y-%m-%d %H:%M:%S',time.localtime(time.time()))}")
     logger.info(f"Analyzing contract at address: {address}")
@@ -50,10 +61,11 @@ def static_analyzer(address, working_dir="./", loop_uncover_times:int=5):
 
     # Transform EVM paths to Three-Address Code (TAC) paths
     logger.info("Transforming EVM paths to TAC paths...")
+    code = code_buffer(bytecode) if codecopy_constants else None
     tac_paths = []
     for evm_path in sorted(cfg.evm_paths, key=lambda x:len(x.blocks), reverse=False):
         try:
-            _tac_paths, _ = transform_from_evm_path(evm_path, cfg=cfg)
+            _tac_paths, _ = transform_from_evm_path(evm_path, cfg=cfg, code=code)
             if _tac_paths is not None and len(_tac_paths) > 0:
                 tac_paths.extend([tac_path for tac_path in _tac_paths if not tac_path.illegal])
         except (IndexError, MemoryHandlingException, Exception) as e:
@@ -74,7 +86,13 @@ def static_analyzer(address, working_dir="./", loop_uncover_times:int=5):
     functions = analyze_functions(tac_paths)
     
     # Initialize variable analyzer
-    evm_analyzer = EVMVariableAnalyzer(language=language)
+    if checker is None:
+        initial_timeout, max_timeout = query_timeouts
+        checker = PathChecker(theory=smt_theory,
+                              cache=FeasibilityCache(feasibility_cache) if feasibility_cache is not None else None,
+                              budget=SolverBudget(initial_timeout, max_timeout, budget=solver_timeout),
+                              recorder=QueryRecorder(f"{working_dir}/smt2_queries") if record_queries else None)
+    evm_analyzer = EVMVariableAnalyzer(language=language, checker=checker)
     
     # Extract state variables
     logger.info("Extracting state variables...")
@@ -105,6 +123,20 @@ def static_analyzer(address, working_dir="./", loop_uncover_times:int=5):
                 except Exception as e:
                     logger.debug(f"Error during semantic unit extraction: {str(e)}")
                     continue
+    logger.info(f"Analyzed trees cache: {evm_analyzer.has_analyzed_trees.stats()}")
+    if evm_analyzer.checker is not None:
+        infeasible_prefixes = evm_analyzer.checker.infeasible_path_pres
+        logger.info(f"Infeasible prefixes: {infeasible_prefixes.n_prefixes} recorded, {infeasible_prefixes.hits} checks cut off")
+        logger.info(f"SMT translation cache: {evm_analyzer.checker.translator.stats()}")
+        logger.info(f"Interval presolver: {evm_analyzer.checker.presolver.stats()}")
+        logger.info(f"Solver: {evm_analyzer.checker.budget.stats()}")
+        conflicts = evm_analyzer.checker.conflicts
+        logger.info(f"Learned conflicts: {len(conflicts.conflicts)} recorded, {conflicts.hits} checks refuted")
+        if evm_analyzer.checker.recorder is not None:
+            logger.info(f"Recorded {evm_analyzer.checker.recorder.n_queries} queries to {evm_analyzer.checker.recorder.directory}")
+        if evm_analyzer.checker.cache is not None:
+            logger.info(f"Feasibility cache: {evm_analyzer.checker.cache.stats()}")
+            evm_analyzer.checker.cache.close()
 
     # Generate and export CFG visualization
     logger.info(f"Exporting CFG visualization to {working_dir}/cfg.html")
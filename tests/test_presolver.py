@@ -0,0 +1,45 @@
+import random
+from typing import *
+
+import z3
+
+from disco.solver.presolver import decide, parse_atom
+
+def comparison(rng:random.Random, symbol:z3.ExprRef, width:int) -> z3.BoolRef:
+    value = rng.randrange(1 << width) if width is not None else rng.randrange(-2, 8)
+    if width is not None:
+        value = z3.BitVecVal(value, width)
+        lt, le, gt, ge = z3.ULT, z3.ULE, z3.UGT, z3.UGE
+    else:
+        lt, le, gt, ge = (lambda a, b: a < b), (lambda a, b: a <= b), (lambda a, b: a > b), (lambda a, b: a >= b)
+    e = rng.choice([symbol == value, symbol != value, lt(symbol, value), le(symbol, value), gt(symbol, value), ge(symbol, value)])
+    return z3.Not(e) if rng.random() < 0.3 else e
+
+def random_paths(width:Optional[int], n_paths:int, seed:int=0):
+    rng = random.Random(seed)
+    symbols = [z3.BitVec(name, width) if width is not None else z3.Int(name) for name in "ABCD"]
+    for _ in range(n_paths):
+        constraints = []
+        for _ in range(rng.randint(1, 7)):
+            symbol = rng.choice(symbols)
+            constraints.append(symbol == rng.choice(symbols) if rng.random() < 0.3 else comparison(rng, symbol, width))
+        yield constraints
+
+def z3_decide(constraints) -> bool:
+    solver = z3.Solver()
+    solver.add(*constraints)
+    return solver.check() == z3.sat
+
+def test_equality_chains_share_their_bounds():
+    A, B, C, D = (("A", z3.Z3_INT_SORT), ("B", z3.Z3_INT_SORT), ("C", z3.Z3_INT_SORT), ("D", z3.Z3_INT_SORT))
+    chain = [(A, "same", B, None), (B, "same", C, None), (C, "same", D, None)]
+    assert not decide(chain + [(A, "==", 1, None), (D, "==", 2, None)])
+    assert decide(chain + [(A, "==", 1, None), (D, "==", 1, None)])
+
+def test_decide_agrees_with_z3():
+    # equality chains, bounds and `!=` sets over unbounded integers and 3-bit vectors (small enough to exclude every value)
+    for width in (None, 3):
+        for constraints in random_paths(width, 500):
+            atoms = [parse_atom(e) for e in constraints]
+            assert all(atom is not None for atom in atoms)
+            assert decide(atoms) == z3_decide(constraints), constraints
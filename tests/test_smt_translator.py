@@ -0,0 +1,19 @@
+import z3
+
+from disco.common.structures.tac_tree import OpTree
+from disco.solver.smt import SMTTranslator
+
+def comparison(name:str) -> OpTree:
+    return OpTree(name, [OpTree("CALLDATASIZE"), OpTree.from_value(3)])
+
+def test_signed_and_unsigned_comparisons_are_cached_apart():
+    # GT/SGT and LT/SLT are rendered the same, the cache must not mix them up
+    for unsigned, signed in (("GT", "SGT"), ("LT", "SLT")):
+        translator = SMTTranslator("bv")
+        translator.translate(comparison(unsigned))
+        translator.translate(OpTree("ISZERO", [comparison(unsigned)]))
+
+        for tree in (comparison(signed), OpTree("ISZERO", [comparison(signed)])):
+            cached, _ = translator.translate(tree)
+            fresh, _ = SMTTranslator("bv").translate(tree)
+            assert z3.eq(cached, fresh), f"{tree}: {cached} != {fresh}"